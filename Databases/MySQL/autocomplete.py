@@ -0,0 +1,365 @@
+import os
+import re
+import bisect
+import difflib
+import threading
+from collections import Counter
+
+from Databases.MySQL.schema import DB_STRUCTURE_FILE, iter_tables, load_structure
+
+
+SQL_KEYWORDS = (
+    "SELECT", "FROM", "WHERE", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "CROSS", "ON", "USING",
+    "GROUP", "ORDER", "BY", "HAVING", "LIMIT", "OFFSET", "AS", "AND", "OR", "NOT", "IN", "IS",
+    "NULL", "LIKE", "BETWEEN", "EXISTS", "DISTINCT", "UNION", "ALL", "CASE", "WHEN", "THEN",
+    "ELSE", "END", "ASC", "DESC", "INSERT", "INTO", "VALUES", "UPDATE", "SET", "DELETE", "WITH",
+    "COUNT", "SUM", "AVG", "MIN", "MAX", "SHOW", "TABLES", "DESCRIBE", "EXPLAIN",
+)
+
+# Words that can follow a table reference, so they are never its alias.
+_NOT_ALIASES = {
+    "where", "join", "left", "right", "inner", "outer", "cross", "natural", "straight_join", "on",
+    "using", "group", "order", "having", "limit", "union", "set", "values", "select", "for",
+    "lock", "window", "partition", "force", "ignore", "use", "as",
+}
+
+# Fuzzy matching: candidates are gathered from the rarest trigrams first;
+# postings longer than this are skipped once there are candidates (they
+# match too much to narrow anything). Candidates are then scored exactly.
+_MAX_POSTING = 1000
+_FUZZY_CANDIDATES = 200
+_FUZZY_MIN_SCORE = 0.3
+
+# The editors double as natural-language prompt boxes; completions are only
+# offered once the text starts like a SQL statement (same list as the web page).
+# SHOW, DESCRIBE and EXPLAIN also start ordinary sentences ("show me all
+# users"), so they must look like the statement form.
+_SQL_START_RE = re.compile(
+    r"""^\s*(
+      (select|with|insert|update|delete|create|alter|drop|replace)\b
+    | show\s+(full\s+|global\s+|session\s+)?(tables|databases|schemas|columns|fields|index|indexes|keys
+        |create|status|variables|processlist|grants|triggers|events|warnings|errors|engines|table|plugins
+        |privileges|procedure|function|open|master|slave|replica|binary)\b
+    | explain\s+(select|with|insert|update|delete|replace|table|format|analyze)\b
+    | (describe|desc|explain)\s+[\w`.$]+(\s+[\w`.$%]+)?\s*;?\s*$
+    )""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_WORD_BEFORE_CURSOR_RE = re.compile(r"(?:`?([\w$]+)`?\.)?`?([\w$]*)$")
+_CLAUSE_RE = re.compile(
+    r"\b(select|from|join|update|into|table|where|on|by|having|set|and|or|when|then|else|describe|desc)\b",
+    re.IGNORECASE,
+)
+_TABLE_CLAUSES = {"from", "join", "update", "into", "table", "describe", "desc"}
+_SOURCE_RE = re.compile(r"\b(?:from|join|update|into)\s+", re.IGNORECASE)
+_TABLE_REF_RE = re.compile(
+    r"\s*`?(?:[\w$]+`?\.`?)?([\w$]+)`?(?:\s+(?:as\s+)?`?([\w$]+)`?)?\s*(,)?",
+    re.IGNORECASE,
+)
+
+
+def _trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def looks_like_sql(text):
+    """True if `text` starts with a SQL statement keyword rather than prose."""
+    return _SQL_START_RE.match(text) is not None
+
+
+def parse_context(text, cursor=None):
+    """
+    Reads the SQL around the cursor. Returns (qualifier, prefix, expects_table,
+    sources) where `qualifier` is the word before a dot being completed
+    (`o` in `o.na`), `prefix` is the partial word at the cursor and
+    `sources` maps each alias and table name in FROM/JOIN/UPDATE/INTO
+    clauses (anywhere in the statement) to its table.
+    """
+    cursor = len(text) if cursor is None else cursor
+    before = text[:cursor]
+    qualifier, prefix = _WORD_BEFORE_CURSOR_RE.search(before).groups()
+
+    clauses = _CLAUSE_RE.findall(before[:len(before) - len(prefix)])
+    expects_table = bool(clauses) and clauses[-1].lower() in _TABLE_CLAUSES and not qualifier
+
+    # Only the statement the cursor is in counts.
+    start = before.rfind(";") + 1
+    end = text.find(";", cursor)
+    statement = text[start:end if end != -1 else len(text)]
+
+    sources = {}
+    for match in _SOURCE_RE.finditer(statement):
+        pos = match.end()
+        while True:
+            ref = _TABLE_REF_RE.match(statement, pos)
+            if not ref or not ref.group(1):
+                break
+            table, alias, comma = ref.groups()
+            if table.lower() in _NOT_ALIASES:
+                break
+            sources.setdefault(table.lower(), table)
+            if alias and alias.lower() not in _NOT_ALIASES:
+                sources[alias.lower()] = table
+            if not comma:
+                break
+            pos = ref.end()
+    return qualifier, prefix, expects_table, sources
+
+
+# -----------------------------
+# Completer
+# -----------------------------
+class SchemaCompleter:
+    """
+    Completion index over the table and column names of the saved schema.
+
+    Prefix lookups bisect a sorted list of lower-cased identifiers (the flat
+    form of a prefix trie: the same O(log n + k) lookup, without a Python
+    object per trie node). Misspelled words fall back to a trigram index
+    ranked by Jaccard similarity. `update` diffs the schema table by table,
+    so a schema change only re-indexes the tables that changed.
+    """
+
+    def __init__(self, path=DB_STRUCTURE_FILE):
+        self.path = path
+        self._keys = []
+        # lower-cased identifier -> {"name": display name, "tables": set, "columns": Counter}
+        self._words = {}
+        self._grams = {}
+        # lower-cased table -> (table, [column names], ((column, type), ...))
+        self._tables = {}
+        self._mtime = None
+        self._lock = threading.RLock()
+
+    # ------------------ Index ------------------
+    def _add_word(self, name, kind, table, new_keys):
+        key = name.lower()
+        entry = self._words.get(key)
+        if entry is None:
+            entry = self._words[key] = {"name": name, "tables": set(), "columns": Counter()}
+            new_keys.append(key)
+            for gram in _trigrams(key):
+                self._grams.setdefault(gram, set()).add(key)
+        if kind == "table":
+            entry["tables"].add(table)
+        else:
+            entry["columns"][table] += 1
+
+    def _remove_word(self, name, kind, table):
+        key = name.lower()
+        entry = self._words.get(key)
+        if entry is None:
+            return
+        if kind == "table":
+            entry["tables"].discard(table)
+        else:
+            entry["columns"][table] -= 1
+            if entry["columns"][table] <= 0:
+                del entry["columns"][table]
+        if entry["tables"] or entry["columns"]:
+            return
+        del self._words[key]
+        del self._keys[bisect.bisect_left(self._keys, key)]
+        for gram in _trigrams(key):
+            posting = self._grams.get(gram)
+            if posting is not None:
+                posting.discard(key)
+                if not posting:
+                    del self._grams[gram]
+
+    def _add_table(self, table, columns, new_keys):
+        self._tables[table.lower()] = (table, [c for c, _ in columns], columns)
+        self._add_word(table, "table", table, new_keys)
+        for column, _ in columns:
+            self._add_word(column, "column", table, new_keys)
+
+    def _remove_table(self, key):
+        table, columns, _ = self._tables.pop(key)
+        self._remove_word(table, "table", table)
+        for column in columns:
+            self._remove_word(column, "column", table)
+
+    def update(self, structure):
+        """Re-indexes only the tables that were added, dropped or changed. Returns the number re-indexed."""
+        tables = {table.lower(): (table, tuple(columns)) for table, columns in iter_tables(structure)}
+
+        changed = 0
+        new_keys = []
+        with self._lock:
+            for key in list(self._tables):
+                # Comparing the column tuples is cheaper than hashing every table.
+                if key not in tables or tables[key][1] != self._tables[key][2]:
+                    self._remove_table(key)
+                    changed += 1
+            for key, (table, columns) in tables.items():
+                if key not in self._tables:
+                    self._add_table(table, columns, new_keys)
+                    changed += 1
+            # A few new names are inserted in place; a bulk load sorts once.
+            if len(new_keys) > 1000:
+                self._keys = sorted(self._words)
+            else:
+                for key in new_keys:
+                    bisect.insort(self._keys, key)
+        return changed
+
+    def refresh(self):
+        """Re-reads the saved schema if the file changed since the last call. Cheap enough to call per request."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return 0
+        with self._lock:
+            if mtime == self._mtime:
+                return 0
+            self._mtime = mtime
+            return self.update(load_structure(self.path))
+
+    def __len__(self):
+        return len(self._keys)
+
+    # ------------------ Lookup ------------------
+    def _item(self, key, kind):
+        entry = self._words[key]
+        if kind == "table":
+            return {"text": entry["name"], "kind": "table", "detail": "table"}
+        owners = entry["columns"]
+        table = next(iter(owners)) if len(owners) == 1 else f"{len(owners)} tables"
+        return {"text": entry["name"], "kind": "column", "detail": table}
+
+    def _prefix_keys(self, prefix, limit):
+        """Up to `limit` identifiers starting with `prefix`, exact match first, then shortest."""
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + "\uffff", start)
+        # Scan a bounded window so a one-letter prefix on a huge schema stays cheap.
+        keys = self._keys[start:min(end, start + limit * 20)]
+        return sorted(keys, key=lambda k: (len(k), k))[:limit]
+
+    def _fuzzy_keys(self, word, limit, exclude=()):
+        """Identifiers sharing the most trigrams with `word` (typos, missing letters)."""
+        grams = _trigrams(word.lower())
+        postings = sorted((self._grams.get(g, ()) for g in grams), key=len)
+        counts = Counter()
+        for posting in postings:
+            if len(posting) > _MAX_POSTING and counts:
+                break
+            counts.update(posting)
+
+        scored = []
+        for key, _ in counts.most_common(_FUZZY_CANDIDATES):
+            if key in exclude:
+                continue
+            key_grams = _trigrams(key)
+            score = len(grams & key_grams) / len(grams | key_grams)
+            if score >= _FUZZY_MIN_SCORE:
+                scored.append((-score, len(key), key))
+        return [key for _, _, key in sorted(scored)[:limit]]
+
+    def _table_columns(self, table, prefix):
+        entry = self._tables.get(table.lower())
+        if entry is None:
+            return []
+        prefix = prefix.lower()
+        return [(column, entry[0]) for column in entry[1] if column.lower().startswith(prefix)]
+
+    def complete(self, text, cursor=None, limit=20):
+        """
+        Completions for the word at `cursor` (default: end of `text`), as
+        [{"text", "kind", "detail"}, ...] with the most relevant first:
+        columns of `alias.`/`table.`; tables after FROM/JOIN/UPDATE/INTO;
+        otherwise columns of the tables in the statement, then its aliases,
+        then any matching identifier or keyword. Misspellings fall back to
+        fuzzy matches.
+        """
+        qualifier, prefix, expects_table, sources = parse_context(text, cursor)
+        items, seen = [], set()
+
+        def add(item):
+            # A column already offered for a table in scope is not repeated.
+            marker = (item["text"].lower(), item["kind"])
+            if marker not in seen and len(items) < limit:
+                seen.add(marker)
+                items.append(item)
+
+        with self._lock:
+            if qualifier:
+                table = sources.get(qualifier.lower(), qualifier)
+                for column, owner in self._table_columns(table, prefix):
+                    add({"text": column, "kind": "column", "detail": owner})
+                entry = self._tables.get(table.lower())
+                if not items and prefix and entry:
+                    # One table's columns are few enough to compare directly,
+                    # which also catches transposed letters trigrams miss.
+                    columns = {c.lower(): c for c in entry[1]}
+                    for key in difflib.get_close_matches(prefix.lower(), columns, n=limit, cutoff=0.6):
+                        add({"text": columns[key], "kind": "column", "detail": entry[0]})
+                return items
+
+            if not expects_table:
+                for table in dict.fromkeys(sources.values()):
+                    for column, owner in self._table_columns(table, prefix):
+                        add({"text": column, "kind": "column", "detail": owner})
+                for alias, table in sources.items():
+                    if alias != table.lower() and alias.startswith(prefix.lower()):
+                        add({"text": alias, "kind": "alias", "detail": table})
+
+            if prefix or expects_table:
+                for key in self._prefix_keys(prefix, limit * 2):
+                    entry = self._words[key]
+                    if entry["tables"]:
+                        add(self._item(key, "table"))
+                    if entry["columns"] and not expects_table:
+                        add(self._item(key, "column"))
+
+            if prefix and not expects_table:
+                upper = prefix.upper()
+                for keyword in SQL_KEYWORDS:
+                    if keyword.startswith(upper):
+                        add({"text": keyword, "kind": "keyword", "detail": "keyword"})
+
+            if len(prefix) >= 3 and len(items) < limit:
+                for key in self._fuzzy_keys(prefix, limit, exclude={i["text"].lower() for i in items}):
+                    entry = self._words[key]
+                    if entry["tables"]:
+                        add(self._item(key, "table"))
+                    elif not expects_table:
+                        add(self._item(key, "column"))
+        return items
+
+
+# Example usage (optional, for a quick check against a synthetic schema):
+#   python -m Databases.MySQL.autocomplete
+if __name__ == "__main__":
+    import time
+
+    structure = {
+        f"table_{t}": [{"name": f"col_{t}_{c}", "type": "int"} for c in range(20)] + [{"name": "id", "type": "int"}]
+        for t in range(5000)
+    }
+    completer = SchemaCompleter()
+    started = time.perf_counter()
+    completer.update(structure)
+    print(f"Indexed {len(completer)} identifiers in {time.perf_counter() - started:.2f}s")
+
+    # "|" marks the cursor.
+    for sql in [
+        "SELECT * FROM table_12|",
+        "SELECT o.| FROM table_42 o",
+        "SELECT col_42_1 FROM table_42 t JOIN table_7 AS u ON t.id = u.|",
+        "SELECT col_42_|",
+        "SELECT * FROM tabel_421|",
+    ]:
+        cursor = sql.index("|")
+        sql = sql.replace("|", "")
+        started = time.perf_counter()
+        items = completer.complete(sql, cursor)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{elapsed:6.2f} ms  {sql!r}: {[i['text'] for i in items[:5]]}")
+
+    structure["table_1"].append({"name": "created_at", "type": "datetime"})
+    del structure["table_2"]
+    started = time.perf_counter()
+    changed = completer.update(structure)
+    print(f"Re-indexed {changed} tables in {(time.perf_counter() - started) * 1000:.1f} ms")
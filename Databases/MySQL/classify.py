@@ -0,0 +1,49 @@
+import re
+
+
+# Quoted strings, backtick identifiers and comments are blanked out before
+# keywords are inspected, so their contents never affect classification.
+_NOISE_RE = re.compile(
+    r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`(?:[^`]|``)*`|--[^\n]*|\#[^\n]*|/\*.*?\*/""",
+    re.DOTALL,
+)
+_WORD_RE = re.compile(r"[A-Za-z_]+")
+
+_READ_VERBS = {"SELECT", "SHOW", "DESCRIBE", "DESC", "EXPLAIN", "WITH", "TABLE", "VALUES"}
+# MySQL 8 allows WITH ... UPDATE/DELETE; these are reserved words, so they
+# cannot appear unquoted in a read-only statement.
+_WRITE_WORDS = {"INSERT", "UPDATE", "DELETE"}
+
+
+def _words(sql):
+    return [w.upper() for w in _WORD_RE.findall(_NOISE_RE.sub(" ", sql))]
+
+
+def is_single_statement(sql):
+    """True if `sql` holds at most one statement (a trailing semicolon is allowed)."""
+    body = _NOISE_RE.sub(" ", sql).strip().rstrip(";")
+    return ";" not in body
+
+
+def is_read_only(sql):
+    """
+    True if `sql` is a single statement that cannot modify data or take
+    locks: SELECT/SHOW/DESCRIBE/EXPLAIN (and WITH ... SELECT) without
+    FOR UPDATE, LOCK IN SHARE MODE or SELECT ... INTO.
+    """
+    if not is_single_statement(sql):
+        return False
+    words = _words(sql)
+    if not words or words[0] not in _READ_VERBS:
+        return False
+    if _WRITE_WORDS & set(words):
+        return False
+    for i, word in enumerate(words):
+        nxt = words[i + 1] if i + 1 < len(words) else ""
+        if word == "FOR" and nxt in ("UPDATE", "SHARE"):
+            return False
+        if word == "LOCK" and nxt == "IN":
+            return False
+        if word == "INTO":
+            return False
+    return True
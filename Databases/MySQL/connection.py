@@ -1,10 +1,23 @@
 import os
-import json
 import mysql.connector
 from sqlalchemy import create_engine, inspect , exc
+from Databases.MySQL.statement_cache import PreparedStatementCache
+from Databases.MySQL.schema import write_json_atomic
+from Databases.MySQL.router import ReplicaRouter
 
 class DatabaseManager:
-    def __init__(self, port, host, user, password, database):
+    def __init__(self, port, host, user, password, database, statement_cache_size=64, auto_parameterize=False,
+                 replicas=None):
+        self.statements = None
+        self.router = None
+        self.router_session = None
+        if replicas:
+            # Read-only statements are sent to a replica; writes and transactions use self.conn.
+            self.router = ReplicaRouter(
+                {"host": host, "port": port, "user": user, "password": password, "database": database},
+                replicas,
+            )
+            self.router_session = self.router.session()
         try:
             self.conn = mysql.connector.connect(
                 host=host,
@@ -14,6 +27,9 @@ class DatabaseManager:
                 database=database
             )
             self.cursor = self.conn.cursor()
+            self.statements = PreparedStatementCache(
+                self.conn, max_size=statement_cache_size, auto_parameterize=auto_parameterize
+            )
             print("✅ Database connected.")
 
             try:
@@ -40,8 +56,7 @@ class DatabaseManager:
                 print("🔍 Preparing to write DB structure to file...")
                 filename = os.path.join(os.path.dirname(__file__), "db_structure.json")
 
-                with open(filename, "w", encoding="utf-8") as f:
-                    json.dump(self.db_structure, f, indent=4)
+                write_json_atomic(filename, self.db_structure, indent=4)
 
                 print(f"✅ Data successfully written to {filename}")
 
@@ -59,11 +74,23 @@ class DatabaseManager:
         return self.db_structure
 
 
-    def execute_query(self, query):
+    def execute_query(self, query, params=None):
+        """
+        Runs `query`. When `params` is given (or the manager was created with
+        auto_parameterize=True) the statement goes through the prepared
+        statement cache so the server can re-use its parsed plan.
+        """
         if not self.conn or not self.cursor:
             print("⚠️ No active database connection.")
             return None
 
+        if params is not None or self.statements.auto_parameterize:
+            return self.execute_prepared(query, params)
+
+        endpoint = self.router_session.route(query) if self.router else None
+        if endpoint is not None and endpoint.role == "replica":
+            return self.execute_on_replica(endpoint, query)
+
         try:
             self.cursor.execute(query)
 
@@ -84,8 +111,48 @@ class DatabaseManager:
             print(f"⚠️ Query error: {err}")
             return None, None
 
+    def execute_on_replica(self, endpoint, query):
+        def read(conn, served_by):
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query)
+                rows = cursor.fetchall()
+                columns = [desc[0] for desc in cursor.description]
+                print(f"✅ Query executed successfully on {served_by.name}.")
+                return columns, rows
+            finally:
+                cursor.close()
+
+        try:
+            return self.router.run_on(endpoint, read)
+        except mysql.connector.Error as err:
+            print(f"⚠️ Query error: {err}")
+            return None, None
+
+    def execute_prepared(self, query, params=None):
+        if not self.conn or not self.statements:
+            print("⚠️ No active database connection.")
+            return None
+
+        try:
+            columns, rows = self.statements.execute(query, params)
+            if columns is None:
+                self.conn.commit()
+                print("✅ Query executed successfully (no data to fetch).")
+            else:
+                print("✅ Query executed successfully.")
+            return columns, rows
+
+        except mysql.connector.Error as err:
+            print(f"⚠️ Query error: {err}")
+            return None, None
+
     def close(self):
         try:
+            if self.statements:
+                self.statements.clear()
+            if self.router:
+                self.router.close()
             if self.cursor:
                 self.cursor.close()
             if self.conn and self.conn.is_connected():
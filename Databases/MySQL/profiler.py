@@ -0,0 +1,348 @@
+import os
+import re
+import json
+import time
+import base64
+import random
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+from Databases.MySQL.schema import SAVE_DIR, iter_tables, table_fingerprint, schema_fingerprint, write_json_atomic
+
+
+PROFILE_FILE = os.path.join(SAVE_DIR, "column_profiles.json")
+# Bumped when the cached statistics change shape; older caches are discarded.
+PROFILE_VERSION = 2
+
+# Large text/binary columns are never sampled: they are expensive to pull
+# and their values are useless as prompt hints.
+_SKIP_TYPES = ("blob", "binary", "longtext", "mediumtext", "json", "geometry")
+_NUMERIC_TYPES = ("int", "tinyint", "smallint", "mediumint", "bigint", "decimal", "numeric", "float", "double", "real")
+_TEMPORAL_TYPES = ("date", "datetime", "timestamp", "time", "year")
+
+# Sampled values are only kept (and sent to the LLM) where they are not
+# sensitive: min/max of numeric and date/time columns, and the top values of
+# columns with at most this many distinct values that repeat in the sample
+# (statuses, categories). Emails, tokens and hashes never leave the sample.
+LOW_CARDINALITY = 50
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+# -----------------------------
+# HyperLogLog
+# -----------------------------
+class HyperLogLog:
+    """
+    Distinct-count sketch with 2**p one-byte registers. Registers from
+    successive samples of the same column are merged with `merge`, so the
+    estimate improves as more PK ranges are profiled over time.
+    """
+
+    def __init__(self, p=10, registers=None):
+        self.p = p
+        self.m = 1 << p
+        if registers is None:
+            registers = np.zeros(self.m, dtype=np.uint8)
+        self.registers = registers
+
+    @staticmethod
+    def _hash(values):
+        return np.fromiter(
+            (int.from_bytes(hashlib.blake2b(repr(v).encode("utf-8"), digest_size=8).digest(), "big") for v in values),
+            dtype=np.uint64,
+            count=len(values),
+        )
+
+    def add(self, values):
+        if len(values) == 0:
+            return
+        hashes = self._hash(values)
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes << np.uint64(self.p)
+        # Rank = position of the leftmost 1-bit in the remaining 64 - p bits.
+        rank = np.full(len(hashes), 64 - self.p + 1, dtype=np.uint8)
+        nonzero = rest != 0
+        rank[nonzero] = (64 - np.floor(np.log2(rest[nonzero].astype(np.float64)))).astype(np.uint8)
+        np.maximum.at(self.registers, idx, np.minimum(rank, 64 - self.p + 1))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m * self.m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros:
+            return int(round(self.m * np.log(self.m / zeros)))
+        return int(round(raw))
+
+    def dumps(self):
+        return base64.b64encode(self.registers.tobytes()).decode("ascii")
+
+    @classmethod
+    def loads(cls, data, p=10):
+        registers = np.frombuffer(base64.b64decode(data), dtype=np.uint8).copy()
+        return cls(p=p, registers=registers)
+
+
+# -----------------------------
+# Column Profiler
+# -----------------------------
+def _quote(identifier):
+    return "`" + identifier.replace("`", "``") + "`"
+
+
+def _short(value, limit=40):
+    text = str(value)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class ColumnProfiler:
+    """
+    Computes per-column statistics from bounded samples and caches them in
+    SavedData/column_profiles.json, keyed to the schema fingerprint.
+
+    Tables with a single integer primary key are sampled with a few random
+    PK-range scans (each an index range read of `sample_rows / ranges` rows); other
+    tables fall back to a plain `LIMIT`. Only tables whose columns changed or
+    whose profile is older than `max_age` are re-profiled on refresh.
+    """
+
+    def __init__(self, connect, sample_rows=2000, ranges=4, top_k=5, max_age=24 * 3600, path=PROFILE_FILE):
+        self.connect = connect
+        self.sample_rows = sample_rows
+        self.ranges = ranges
+        self.top_k = top_k
+        self.max_age = max_age
+        self.path = path
+        self._lock = threading.Lock()
+        self._thread = None
+        self.profiles = self.load()
+
+    # ------------------ Cache ------------------
+    def load(self):
+        empty = {"version": PROFILE_VERSION, "schema_fingerprint": None, "tables": {}}
+        if not os.path.exists(self.path):
+            return empty
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                profiles = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable column profile cache: {e}")
+            return empty
+        return profiles if profiles.get("version") == PROFILE_VERSION else empty
+
+    def save(self):
+        write_json_atomic(self.path, self.profiles, ensure_ascii=False, separators=(",", ":"))
+
+    # ------------------ Sampling ------------------
+    def _integer_pk(self, cursor, table):
+        cursor.execute(f"SHOW KEYS FROM {_quote(table)} WHERE Key_name = 'PRIMARY'")
+        keys = cursor.fetchall()
+        if len(keys) != 1:
+            return None
+        pk = keys[0][4]
+        cursor.execute(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+            (table, pk),
+        )
+        row = cursor.fetchone()
+        return pk if row and "int" in str(row[0]).lower() else None
+
+    def _sample(self, cursor, table, columns):
+        select = ", ".join(_quote(c) for c in columns)
+        pk = self._integer_pk(cursor, table)
+        if pk is None:
+            cursor.execute(f"SELECT {select} FROM {_quote(table)} LIMIT %s", (self.sample_rows,))
+            return cursor.fetchall()
+
+        cursor.execute(f"SELECT MIN({_quote(pk)}), MAX({_quote(pk)}) FROM {_quote(table)}")
+        low, high = cursor.fetchone()
+        if low is None:
+            return []
+
+        chunk = max(1, self.sample_rows // self.ranges)
+        rows = []
+        for _ in range(self.ranges):
+            start = random.randint(int(low), int(high))
+            cursor.execute(
+                f"SELECT {select} FROM {_quote(table)} WHERE {_quote(pk)} >= %s ORDER BY {_quote(pk)} LIMIT %s",
+                (start, chunk),
+            )
+            rows.extend(cursor.fetchall())
+        return rows
+
+    def _row_estimate(self, cursor, table):
+        cursor.execute(
+            "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+            (table,),
+        )
+        row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None else None
+
+    # ------------------ Statistics ------------------
+    def _profile_column(self, values, data_type, previous):
+        nulls = np.equal(values, None)
+        present = values[~nulls]
+        stats = {
+            "type": data_type,
+            "null_ratio": round(float(nulls.mean()), 4) if len(values) else None,
+        }
+
+        hll = HyperLogLog.loads(previous["hll"]) if previous and previous.get("hll") else HyperLogLog()
+        hll.add(present)
+        stats["hll"] = hll.dumps()
+        stats["distinct"] = hll.estimate()
+
+        if len(present) == 0:
+            return stats
+
+        # np.unique sorts, so for date/time columns the ends are min/max.
+        uniques, counts = np.unique(present.astype(str), return_counts=True)
+        kind = data_type.lower()
+        if kind.startswith(_NUMERIC_TYPES):
+            numbers = present.astype(np.float64)
+            stats["min"] = float(np.min(numbers))
+            stats["max"] = float(np.max(numbers))
+        elif kind.startswith(_TEMPORAL_TYPES):
+            stats["min"] = _short(uniques[0])
+            stats["max"] = _short(uniques[-1])
+
+        if len(uniques) <= LOW_CARDINALITY and len(uniques) <= len(present) // 2:
+            order = np.argsort(counts)[::-1][:self.top_k]
+            stats["top"] = [[_short(uniques[i]), int(counts[i])] for i in order]
+        return stats
+
+    def profile_table(self, cursor, table, columns):
+        wanted = [(c, t) for c, t in columns if not t.lower().startswith(_SKIP_TYPES)]
+        previous = self.profiles["tables"].get(table, {})
+        if previous.get("table_fingerprint") != table_fingerprint(table, columns):
+            previous = {}
+
+        rows = self._sample(cursor, table, [c for c, _ in wanted]) if wanted else []
+        matrix = np.empty((len(rows), len(wanted)), dtype=object)
+        if rows:
+            matrix[:] = rows
+
+        prev_columns = previous.get("columns", {})
+        return {
+            "table_fingerprint": table_fingerprint(table, columns),
+            "profiled_at": time.time(),
+            "row_estimate": self._row_estimate(cursor, table),
+            "sampled_rows": len(rows),
+            "columns": {
+                name: self._profile_column(matrix[:, j], data_type, prev_columns.get(name))
+                for j, (name, data_type) in enumerate(wanted)
+            },
+        }
+
+    # ------------------ Refresh ------------------
+    def stale_tables(self, structure):
+        """Returns the tables whose columns changed or whose profile expired."""
+        now = time.time()
+        cached = self.profiles["tables"]
+        stale = []
+        for table, columns in iter_tables(structure):
+            entry = cached.get(table)
+            if (
+                not entry
+                or entry.get("table_fingerprint") != table_fingerprint(table, columns)
+                or now - entry.get("profiled_at", 0) > self.max_age
+            ):
+                stale.append((table, columns))
+        return stale
+
+    def refresh(self, structure):
+        """Profiles every stale table, saving after each one."""
+        fingerprint = schema_fingerprint(structure)
+        with self._lock:
+            if self.profiles.get("schema_fingerprint") != fingerprint:
+                current = {table for table, _ in iter_tables(structure)}
+                self.profiles["tables"] = {
+                    t: p for t, p in self.profiles["tables"].items() if t in current
+                }
+                self.profiles["schema_fingerprint"] = fingerprint
+
+            stale = self.stale_tables(structure)
+            if not stale:
+                return
+
+            connection = self.connect()
+            if connection is None:
+                return
+            cursor = connection.cursor()
+            try:
+                for table, columns in stale:
+                    try:
+                        self.profiles["tables"][table] = self.profile_table(cursor, table, columns)
+                        self.save()
+                    except Exception as e:
+                        logging.warning(f"Could not profile table {table}: {e}")
+            finally:
+                cursor.close()
+                connection.close()
+
+    def refresh_in_background(self, structure):
+        """Starts `refresh` on a daemon thread unless one is already running."""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=self.refresh, args=(structure,), daemon=True)
+        self._thread.start()
+        return self._thread
+
+
+# -----------------------------
+# Prompt Snippets
+# -----------------------------
+def _relevant_tables(question, tables):
+    words = set(_WORD_RE.findall(question.lower()))
+    relevant = []
+    for table, columns in tables:
+        names = set(_WORD_RE.findall(table.lower()))
+        cols = {w for c, _ in columns for w in _WORD_RE.findall(c.lower())}
+        stems = {n.rstrip("s") for n in names}
+        if names & words or stems & {w.rstrip("s") for w in words} or len(cols & words) >= 2:
+            relevant.append((table, columns))
+    return relevant
+
+
+def profile_snippets(profiles, structure, question, max_lines=40):
+    """
+    Builds compact per-column hints for the tables the question mentions,
+    e.g. `orders.status: ~4 distinct in sample, top=[paid, open], 2% null`.
+    Distinct counts come from the sampled rows, not the whole table; a
+    column whose sampled values are all different is marked as such.
+    Returns an empty string when nothing relevant has been profiled.
+    """
+    if not profiles or profiles.get("schema_fingerprint") != schema_fingerprint(structure):
+        return ""
+
+    lines = []
+    for table, _ in _relevant_tables(question, iter_tables(structure)):
+        entry = profiles["tables"].get(table)
+        if not entry:
+            continue
+        sampled = entry.get("sampled_rows") or 0
+        for column, stats in entry["columns"].items():
+            distinct = stats.get("distinct")
+            present = sampled * (1 - (stats.get("null_ratio") or 0))
+            if distinct and present and distinct >= 0.9 * present:
+                # A key or near-key; its table-wide count is unknown.
+                parts = [f"unique in sample of {sampled} rows"]
+            else:
+                parts = [f"~{distinct if distinct is not None else '?'} distinct in sample"]
+            if stats.get("top"):
+                parts.append("top=[" + ", ".join(v for v, _ in stats["top"]) + "]")
+            elif "min" in stats:
+                parts.append(f"range={stats['min']}..{stats['max']}")
+            if stats.get("null_ratio"):
+                parts.append(f"{round(stats['null_ratio'] * 100)}% null")
+            lines.append(f"{table}.{column}: " + ", ".join(parts))
+            if len(lines) >= max_lines:
+                return "\n".join(lines)
+    return "\n".join(lines)
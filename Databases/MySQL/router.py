@@ -0,0 +1,323 @@
+import re
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import errors
+
+from Databases.MySQL.classify import is_read_only
+
+
+# Errors that mean the server (not the statement) is the problem; a read
+# that fails with one of these is retried on the primary.
+_SERVER_ERRORS = (errors.InterfaceError, errors.OperationalError, errors.PoolError)
+
+_TX_START_RE = re.compile(r"^\s*(START\s+TRANSACTION|BEGIN|LOCK\s+TABLES?|SET\s+(@@(SESSION\.)?)?AUTOCOMMIT\s*=\s*(0|OFF))\b", re.I)
+_TX_END_RE = re.compile(r"^\s*(COMMIT|ROLLBACK|UNLOCK\s+TABLES?|SET\s+(@@(SESSION\.)?)?AUTOCOMMIT\s*=\s*(1|ON))\b", re.I)
+
+
+def parse_replicas(spec):
+    """
+    Parses "host[:port],host[:port]" (the DB_REPLICAS format) into config
+    dicts. Raises ValueError naming the bad entry if one is malformed.
+    """
+    replicas = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(":")
+        host, port = host.strip(), port.strip()
+        if not host or (port and not port.isdigit()) or (port and not 0 < int(port) < 65536):
+            raise ValueError(f"Invalid replica {item!r}: expected host or host:port.")
+        replicas.append({"host": host, "port": int(port or 3306)})
+    return replicas
+
+
+# -----------------------------
+# Endpoint
+# -----------------------------
+class Endpoint:
+    """One MySQL server with its routing state."""
+
+    def __init__(self, name, role, config):
+        self.name = name
+        self.role = role
+        self.config = config
+        self.outstanding = 0
+        self.lag = None
+        self.lag_checked_at = 0.0
+        self.lag_probed_at = 0.0
+        self.probing = False
+        self.down_until = 0.0
+        self.idle = []
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def __repr__(self):
+        return f"<Endpoint {self.name} {self.role} outstanding={self.outstanding} lag={self.lag}>"
+
+
+# -----------------------------
+# Session
+# -----------------------------
+class RouterSession:
+    """
+    Tracks transaction state for one logical client. Once a transaction or
+    table lock starts, every statement goes to the primary until it ends.
+    """
+
+    def __init__(self, router):
+        self.router = router
+        self.in_transaction = False
+
+    def route(self, sql):
+        if _TX_START_RE.match(sql):
+            self.in_transaction = True
+            return self.router.primary
+        if _TX_END_RE.match(sql):
+            self.in_transaction = False
+            return self.router.primary
+        return self.router.route(sql, in_transaction=self.in_transaction)
+
+
+# -----------------------------
+# Router
+# -----------------------------
+class ReplicaRouter:
+    """
+    Sends read-only statements to the least busy healthy replica and
+    everything else to the primary.
+
+    A replica is eligible while it is not marked down and its replication
+    lag, probed in the background every `lag_check_interval` seconds, was
+    measured recently and is at most `max_lag` seconds. Replicas that fail
+    to connect, fail mid-query or stop replicating are marked down for
+    `cooldown` seconds, and their reads fall back to the primary.
+
+    Connections give up after `connect_timeout` seconds, and replica reads
+    after `read_timeout` seconds without data, so an unreachable server
+    fails over quickly instead of waiting for the OS TCP timeout. Either
+    can be overridden per endpoint ("connection_timeout", "read_timeout").
+    """
+
+    def __init__(self, primary, replicas=(), max_lag=5.0, lag_check_interval=5.0, cooldown=30.0,
+                 pool_size=4, connect_timeout=3, read_timeout=30, connect=mysql.connector.connect):
+        primary = dict(primary)
+        primary.setdefault("connection_timeout", connect_timeout)
+        self.primary = Endpoint("primary", "primary", primary)
+        self.replicas = []
+        for i, replica in enumerate(replicas):
+            # Replicas inherit credentials and database from the primary.
+            config = dict(primary)
+            config["read_timeout"] = read_timeout
+            config.update(replica)
+            self.replicas.append(Endpoint(f"replica{i + 1}", "replica", config))
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.cooldown = cooldown
+        self.pool_size = pool_size
+        self.connect = connect
+        self._lock = threading.Lock()
+
+    def session(self):
+        return RouterSession(self)
+
+    # ------------------ Routing ------------------
+    def route(self, sql, in_transaction=False):
+        """Returns the endpoint `sql` should run on, without executing it."""
+        if in_transaction or not self.replicas or not is_read_only(sql):
+            return self.primary
+        candidates = [r for r in self.replicas if r.healthy and self._lag_ok(r)]
+        if not candidates:
+            logging.warning("No healthy replica available; routing read to primary.")
+            return self.primary
+        with self._lock:
+            least = min(r.outstanding for r in candidates)
+            return random.choice([r for r in candidates if r.outstanding == least])
+
+    def mark_down(self, endpoint, reason):
+        endpoint.down_until = time.monotonic() + self.cooldown
+        with self._lock:
+            while endpoint.idle:
+                self._close(endpoint.idle.pop())
+        logging.warning(f"{endpoint.name} marked down for {self.cooldown}s: {reason}")
+
+    # ------------------ Replication Lag ------------------
+    def _lag_ok(self, replica):
+        now = time.monotonic()
+        with self._lock:
+            due = not replica.probing and now - replica.lag_probed_at >= self.lag_check_interval
+            if due:
+                replica.probing = True
+                replica.lag_probed_at = now
+        if due:
+            # Probed in the background so a slow or unreachable replica never
+            # holds up routing; until it answers, the last measured lag applies.
+            threading.Thread(target=self.probe_lag, args=(replica,), daemon=True).start()
+        # A lag that has not been measured for two intervals is unknown.
+        if now - replica.lag_checked_at > 2 * self.lag_check_interval:
+            return False
+        return replica.lag is not None and replica.lag <= self.max_lag
+
+    def probe_lag(self, replica):
+        """Measures the replica's lag now, marking it down if the check fails."""
+        try:
+            lag = self.check_lag(replica)
+        except mysql.connector.Error as e:
+            replica.lag = None
+            self.mark_down(replica, e)
+            return
+        finally:
+            replica.probing = False
+        replica.lag = lag
+        replica.lag_checked_at = time.monotonic()
+        if lag is None:
+            self.mark_down(replica, "replication is not running")
+
+    def check_lag(self, replica):
+        """Returns the replica's lag in seconds, or None when replication is stopped."""
+        with self.connection(replica) as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                except errors.ProgrammingError:
+                    # MySQL < 8.0.22
+                    cursor.execute("SHOW SLAVE STATUS")
+                status = cursor.fetchone()
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        if not status:
+            return None
+        lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+        return None if lag is None else float(lag)
+
+    # ------------------ Connections ------------------
+    def _close(self, conn):
+        try:
+            conn.close()
+        except mysql.connector.Error:
+            pass
+
+    @contextmanager
+    def connection(self, endpoint):
+        """
+        Yields a pooled connection to `endpoint`, counting it as outstanding.
+        Pooled connections use autocommit so a reused connection never reads
+        from a stale snapshot; multi-statement transactions belong on the
+        caller's own primary connection (see RouterSession).
+        """
+        with self._lock:
+            endpoint.outstanding += 1
+            conn = endpoint.idle.pop() if endpoint.idle else None
+        try:
+            if conn is None or not conn.is_connected():
+                conn = self.connect(**endpoint.config)
+                conn.autocommit = True
+            yield conn
+        except BaseException:
+            if conn is not None:
+                self._close(conn)
+            conn = None
+            raise
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+                if conn is not None and len(endpoint.idle) < self.pool_size:
+                    endpoint.idle.append(conn)
+                elif conn is not None:
+                    self._close(conn)
+
+    def run(self, sql, fn, session=None):
+        """
+        Routes `sql` and calls `fn(connection, endpoint)` on the chosen server.
+        Returns fn's result.
+        """
+        endpoint = session.route(sql) if session else self.route(sql)
+        return self.run_on(endpoint, fn)
+
+    def run_on(self, endpoint, fn):
+        """
+        Calls `fn(connection, endpoint)` on `endpoint`. If a replica fails at
+        the server level the call is retried once on the primary.
+        """
+        if endpoint.role == "replica":
+            try:
+                with self.connection(endpoint) as conn:
+                    return fn(conn, endpoint)
+            except _SERVER_ERRORS as e:
+                self.mark_down(endpoint, e)
+                endpoint = self.primary
+        with self.connection(endpoint) as conn:
+            return fn(conn, endpoint)
+
+    def status(self):
+        return [
+            {
+                "name": e.name,
+                "host": e.config.get("host"),
+                "port": e.config.get("port"),
+                "role": e.role,
+                "healthy": e.healthy,
+                "outstanding": e.outstanding,
+                "lag": e.lag,
+            }
+            for e in [self.primary] + self.replicas
+        ]
+
+    def close(self):
+        for endpoint in [self.primary] + self.replicas:
+            with self._lock:
+                while endpoint.idle:
+                    self._close(endpoint.idle.pop())
+
+
+# Example usage (optional, for testing against a primary and a replica on this machine):
+#   DB_USER=root DB_PASSWORD=... DB_DATABASE=test python -m Databases.MySQL.router 3306 3307
+if __name__ == "__main__":
+    import os
+    import sys
+
+    primary_port, *replica_ports = [int(p) for p in sys.argv[1:]] or [3306]
+    router = ReplicaRouter(
+        {
+            "host": os.getenv("DB_HOST", "127.0.0.1"),
+            "port": primary_port,
+            "user": os.getenv("DB_USER", "root"),
+            "password": os.getenv("DB_PASSWORD", ""),
+            "database": os.getenv("DB_DATABASE"),
+        },
+        [{"port": p} for p in replica_ports],
+    )
+    for replica in router.replicas:
+        router.probe_lag(replica)
+    session = router.session()
+    for statement in [
+        "SELECT @@port",
+        "SHOW TABLES",
+        "UPDATE t SET a = 1",
+        "SELECT * FROM t FOR UPDATE",
+        "START TRANSACTION",
+        "SELECT @@port",
+        "COMMIT",
+        "SELECT @@port",
+    ]:
+        print(f"{statement:<30} -> {session.route(statement).name}")
+
+    def server_port(conn, endpoint):
+        cursor = conn.cursor()
+        cursor.execute("SELECT @@port")
+        port = cursor.fetchone()[0]
+        cursor.close()
+        return endpoint.name, port
+
+    print("Executed:", router.run("SELECT @@port", server_port))
+    print(router.status())
+    router.close()
@@ -0,0 +1,94 @@
+import os
+import json
+import stat
+import hashlib
+import tempfile
+import threading
+
+
+# -----------------------------
+# Common Paths
+# -----------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAVE_DIR = os.path.join(BASE_DIR, "..", "..", "SavedData")
+DB_STRUCTURE_FILE = os.path.join(SAVE_DIR, "db_structure.json")
+
+_write_lock = threading.Lock()
+
+
+def iter_tables(structure):
+    """
+    Normalizes the saved DB structure into [(table_name, [(column, type), ...])].
+
+    db_structure.json is written in three shapes: the desktop app stores
+    [[table, [[column, type], ...]], ...], the web app stores
+    [{"table_name": ..., "columns": [[column, type], ...]}, ...] and
+    DatabaseManager stores {table: [{"name": ..., "type": ...}, ...]}.
+    """
+    if not structure:
+        return []
+
+    if isinstance(structure, dict):
+        return [
+            (table, [(col["name"], str(col["type"])) for col in columns])
+            for table, columns in structure.items()
+        ]
+
+    tables = []
+    for entry in structure:
+        if isinstance(entry, dict):
+            table, columns = entry["table_name"], entry["columns"]
+        else:
+            table, columns = entry[0], entry[1]
+        tables.append((table, [(col[0], str(col[1])) for col in columns]))
+    return tables
+
+
+def table_fingerprint(table, columns):
+    """Stable hash of one table's column names and types."""
+    payload = json.dumps([table, [[c, t.lower()] for c, t in columns]], separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def schema_fingerprint(structure):
+    """Stable hash of the whole schema, independent of the file shape and table order."""
+    digest = hashlib.sha1()
+    for table, columns in sorted(iter_tables(structure)):
+        digest.update(table_fingerprint(table, columns).encode("ascii"))
+    return digest.hexdigest()
+
+
+def load_structure(path=DB_STRUCTURE_FILE):
+    """Loads the saved DB structure, or None if it has not been saved yet."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """
+    Writes `data` as JSON to `path` so readers never see a partial file:
+    the JSON goes to a temp file in the same directory, which then replaces
+    `path` in one os.replace. Writers in this process are serialized. The
+    file keeps the mode of the one it replaces (0644 for a new file), not
+    the owner-only mode mkstemp creates temp files with.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    with _write_lock:
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, **dump_kwargs)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            except FileNotFoundError:
+                mode = 0o644
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
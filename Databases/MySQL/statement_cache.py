@@ -0,0 +1,323 @@
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import errors
+
+from Databases.MySQL.classify import is_read_only
+
+
+# -----------------------------
+# Literal Extraction
+# -----------------------------
+# Matches, in order: quoted strings, backtick identifiers, comments,
+# existing placeholders, numeric literals and bare words. Only strings and
+# numbers are lifted out as parameters; everything else is copied through
+# untouched. Quoted tokens are matched first, so '%smith%' or 'why?' is a
+# string, not a placeholder.
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+    | (?P<ident>`(?:[^`]|``)*`)
+    | (?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)
+    | (?P<placeholder>%s|\?)
+    | (?P<number>(?<![\w.])\d+(?:\.\d+)?(?:[eE][+-]?\d+)?(?![\w.]))
+    | (?P<word>[A-Za-z_][\w$]*)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Literals following these keywords change the shape of the plan (or are
+# not allowed to be placeholders at all), so they are left inline.
+_KEEP_AFTER = {"LIMIT", "OFFSET", "INTERVAL"}
+
+# In ORDER BY / GROUP BY lists a bare number is a column position, not a
+# value. The list runs until one of these keywords starts the next clause.
+_END_OF_BY = {"LIMIT", "HAVING", "WINDOW", "UNION", "FOR", "LOCK", "INTO", "SELECT", "FROM", "WHERE", "ON"}
+
+# Numbers in parentheses after a type name are its length/precision
+# (DECIMAL(10,2), VARCHAR(255), DATETIME(6)); they cannot be placeholders.
+_TYPE_ARGS_RE = re.compile(
+    r"""\b(?:DECIMAL|DEC|NUMERIC|FIXED|FLOAT|DOUBLE|REAL|CHAR|NCHAR|VARCHAR|NVARCHAR|BINARY|VARBINARY
+    |BIT|INT|INTEGER|TINYINT|SMALLINT|MEDIUMINT|BIGINT|DATETIME|TIME|TIMESTAMP|YEAR|TEXT|BLOB)
+    \s*\(\s*\d+(?:\s*,\s*\d+)?\s*\)""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+# Strings after these keywords are typed literals (DATE '2020-01-01').
+_TYPED_LITERALS = {"DATE", "TIME", "TIMESTAMP"}
+
+
+def _unquote(token):
+    quote = token[0]
+    body = token[1:-1].replace(quote * 2, quote)
+    return re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t", "0": "\0"}.get(m.group(1), m.group(1)), body)
+
+
+def extract_literals(query):
+    """
+    Replaces string and numeric literals in `query` with `%s` placeholders.
+    Returns (parameterized_sql, params). Only read-only statements are
+    rewritten; other statements, and queries that already contain
+    placeholders, are returned unchanged. Literals that are part of the
+    syntax stay inline: type arguments, typed literals (DATE '...'),
+    charset introducers (_utf8mb4'...', N'...', X'...') and the values
+    kept by _KEEP_AFTER and ORDER/GROUP BY.
+    """
+    if not is_read_only(query):
+        return query, []
+
+    type_args = [m.span() for m in _TYPE_ARGS_RE.finditer(query)]
+    parts = []
+    params = []
+    last_word = None
+    last_word_end = -1
+    in_by = False
+    pos = 0
+    for match in _TOKEN_RE.finditer(query):
+        kind = match.lastgroup
+        token = match.group()
+        if kind == "placeholder":
+            return query, []
+        parts.append(query[pos:match.start()])
+        pos = match.end()
+
+        keep = in_by or last_word in _KEEP_AFTER
+        if kind == "number":
+            keep = keep or any(start <= match.start() < end for start, end in type_args)
+        elif kind == "string" and last_word is not None and not query[last_word_end:match.start()].strip():
+            # A word directly before a string is an introducer (_utf8mb4'x', N'x', X'0F').
+            keep = (
+                keep
+                or last_word in _TYPED_LITERALS
+                or last_word.startswith("_")
+                or last_word_end == match.start()
+            )
+
+        if kind == "string" and not keep:
+            parts.append("%s")
+            params.append(_unquote(token))
+        elif kind == "number" and not keep:
+            parts.append("%s")
+            params.append(float(token) if any(c in token for c in ".eE") else int(token))
+        else:
+            parts.append(token)
+
+        if kind == "word":
+            last_word = token.upper()
+            last_word_end = match.end()
+            if last_word == "BY":
+                in_by = True
+            elif last_word in _END_OF_BY:
+                in_by = False
+        elif kind != "comment":
+            last_word = None
+
+    parts.append(query[pos:])
+    return "".join(parts), params
+
+
+# -----------------------------
+# Prepared Statement Cache
+# -----------------------------
+class PreparedStatementCache:
+    """
+    Per-connection LRU cache of server-side prepared statements.
+
+    mysql-connector binds one prepared statement to each `cursor(prepared=True)`
+    and re-uses it when the same SQL text is executed again, so the cache keeps
+    one prepared cursor per distinct SQL string. Evicted cursors are closed,
+    which deallocates the statement on the server.
+    """
+
+    def __init__(self, conn, max_size=64, auto_parameterize=False):
+        self.conn = conn
+        self.max_size = max_size
+        self.auto_parameterize = auto_parameterize
+        self._cursors = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_cursor(self, sql):
+        cursor = self._cursors.get(sql)
+        if cursor is not None:
+            self._cursors.move_to_end(sql)
+            self.hits += 1
+            return cursor
+
+        self.misses += 1
+        cursor = self.conn.cursor(prepared=True)
+        self._cursors[sql] = cursor
+        while len(self._cursors) > self.max_size:
+            _, old = self._cursors.popitem(last=False)
+            try:
+                old.close()
+            except mysql.connector.Error:
+                pass
+        return cursor
+
+    def _run(self, query, params):
+        cursor = self._get_cursor(query)
+        try:
+            cursor.execute(query, tuple(params))
+        except mysql.connector.Error:
+            # A failed prepare leaves the cursor unusable; drop it.
+            self._cursors.pop(query, None)
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                pass
+            raise
+        return cursor
+
+    def execute(self, query, params=None, auto_parameterize=None):
+        """
+        Executes `query` with `params` on a cached prepared cursor.
+        Returns (columns, rows) for statements that produce a result set and
+        (None, None) otherwise. Raises mysql.connector.Error on failure.
+
+        Without `params`, literals are extracted when `auto_parameterize`
+        (default: the cache setting) is on. If the rewritten statement fails
+        to prepare it is retried as written.
+        """
+        original = None
+        if params is None:
+            params = []
+            if self.auto_parameterize if auto_parameterize is None else auto_parameterize:
+                original = query
+                query, params = extract_literals(query)
+                if not params:
+                    original = None
+
+        with self._lock:
+            try:
+                cursor = self._run(query, params)
+            except errors.ProgrammingError:
+                if original is None:
+                    raise
+                # The rewritten statement did not prepare; run it as written.
+                cursor = self._run(original, ())
+
+            if cursor.with_rows:
+                rows = cursor.fetchall()
+                columns = [desc[0] for desc in cursor.description]
+                return columns, rows
+            return None, None
+
+    def stats(self):
+        return {"size": len(self._cursors), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            for cursor in self._cursors.values():
+                try:
+                    cursor.close()
+                except mysql.connector.Error:
+                    pass
+            self._cursors.clear()
+
+    def close(self):
+        """Closes every cached statement and then the connection."""
+        self.clear()
+        try:
+            self.conn.close()
+        except mysql.connector.Error:
+            pass
+
+
+# -----------------------------
+# Pool
+# -----------------------------
+# Errors after which a connection is not returned to the pool.
+_SERVER_ERRORS = (errors.InterfaceError, errors.OperationalError)
+
+
+class PreparedStatementPool:
+    """
+    Bounded pool of connections, each with its own PreparedStatementCache,
+    for callers that do not own a long-lived connection (web requests, each
+    on a new thread). A connection serves one caller at a time. Up to `size`
+    idle connections are kept; one released beyond that, one that failed at
+    the server level and one that no longer answers a ping are closed.
+
+    `connect()` returns a new connection, or None if it could not connect.
+    """
+
+    def __init__(self, connect, size=4, max_statements=64, auto_parameterize=False):
+        self.connect = connect
+        self.size = size
+        self.max_statements = max_statements
+        self.auto_parameterize = auto_parameterize
+        self._idle = []
+        self._in_use = set()
+        self._lock = threading.Lock()
+        # Hits and misses of caches that have been closed.
+        self._retired = {"hits": 0, "misses": 0}
+
+    def _open(self):
+        conn = self.connect()
+        if conn is None:
+            raise errors.InterfaceError("Database connection failed.")
+        # Without autocommit the first SELECT would open a REPEATABLE READ
+        # snapshot that this long-lived connection never closes, and later
+        # reads would keep seeing data as of that moment.
+        conn.autocommit = True
+        return PreparedStatementCache(conn, self.max_statements, self.auto_parameterize)
+
+    def _retire(self, cache):
+        with self._lock:
+            self._retired["hits"] += cache.hits
+            self._retired["misses"] += cache.misses
+        cache.close()
+
+    @contextmanager
+    def statements(self):
+        """Yields a PreparedStatementCache on a pooled connection. Raises mysql.connector.Error."""
+        with self._lock:
+            cache = self._idle.pop() if self._idle else None
+        if cache is not None:
+            try:
+                cache.conn.ping(reconnect=False)
+            except mysql.connector.Error:
+                self._retire(cache)
+                cache = None
+        if cache is None:
+            cache = self._open()
+
+        with self._lock:
+            self._in_use.add(cache)
+        keep = True
+        try:
+            yield cache
+        except _SERVER_ERRORS:
+            keep = False
+            raise
+        finally:
+            with self._lock:
+                self._in_use.discard(cache)
+                if keep and len(self._idle) < self.size:
+                    self._idle.append(cache)
+                    cache = None
+            if cache is not None:
+                self._retire(cache)
+
+    def stats(self):
+        with self._lock:
+            caches = self._idle + list(self._in_use)
+            totals = [cache.stats() for cache in caches]
+            return {
+                "connections": len(caches),
+                "idle": len(self._idle),
+                "statements": sum(t["size"] for t in totals),
+                "hits": self._retired["hits"] + sum(t["hits"] for t in totals),
+                "misses": self._retired["misses"] + sum(t["misses"] for t in totals),
+            }
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for cache in idle:
+            self._retire(cache)
@@ -0,0 +1,443 @@
+import os
+import io
+import csv
+import sys
+import uuid
+import sqlite3
+import decimal
+import datetime
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+# -----------------------------
+# Defaults
+# -----------------------------
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024      # bytes of row data kept in RAM across all handles
+DEFAULT_DISK_QUOTA = 1024 * 1024 * 1024       # bytes of spill files across all handles
+DEFAULT_MAX_HANDLES = 20
+FETCH_BATCH_SIZE = 5000
+
+
+_PLAIN_TYPES = (int, float, str, bytes)
+
+
+def _to_sqlite(value):
+    """
+    Converts MySQL driver values into types SQLite can store and order.
+    Decimals become text so DECIMAL/money values keep every digit.
+    """
+    if value is None or isinstance(value, _PLAIN_TYPES):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime.datetime) else value.isoformat()
+    if isinstance(value, bytearray):
+        return bytes(value)
+    return str(value)
+
+
+def _process_alive(pid):
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows. A spill file that is
+        # still open cannot be removed there, so removal itself is the check.
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _row_size(row):
+    return sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row)
+
+
+def _sort_key(index, decimal_text=False):
+    def key(row):
+        value = row[index]
+        if value is None:
+            return (0, 0, "")
+        if decimal_text and isinstance(value, str):
+            try:
+                return (1, decimal.Decimal(value), "")
+            except decimal.InvalidOperation:
+                pass
+        if isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool):
+            return (1, value, "")
+        return (2, 0, str(value))
+    return key
+
+
+# -----------------------------
+# Result Handle
+# -----------------------------
+class ResultHandle:
+    """
+    One stored result set. Rows stay in a Python list until the store's
+    memory budget is exceeded, after which the whole result is moved into a
+    SQLite file in the store directory and served from there (memory-mapped).
+    Paging, sorting, filtering and export never go back to MySQL.
+
+    Rows are normalized with _to_sqlite on the way in, whether they stay in
+    memory or not, so a result reads the same either way. Decimals are kept
+    as text; `decimal_columns` lists the columns that hold them.
+    """
+
+    def __init__(self, store, columns):
+        self.id = uuid.uuid4().hex
+        self.store = store
+        self.columns = list(columns)
+        self.row_count = 0
+        self.memory_bytes = 0
+        self.truncated = False
+        self.decimal_columns = set()
+        self._rows = []
+        self._db = None
+        self._path = None
+        self._lock = threading.RLock()
+
+    @property
+    def spilled(self):
+        return self._db is not None
+
+    @property
+    def disk_bytes(self):
+        if not self._path or not os.path.exists(self._path):
+            return 0
+        return os.path.getsize(self._path)
+
+    # ------------------ Writing ------------------
+    def _normalize(self, rows):
+        """Applies _to_sqlite to the columns of `rows` that hold driver-specific types."""
+        # MySQL columns are typed, so the first non-NULL value of each column
+        # tells whether it needs converting; plain columns are left alone.
+        convert = []
+        pending = set(range(len(self.columns)))
+        for row in rows:
+            for i in list(pending):
+                value = row[i]
+                if value is None:
+                    continue
+                pending.discard(i)
+                if not isinstance(value, _PLAIN_TYPES):
+                    convert.append(i)
+                    if isinstance(value, decimal.Decimal):
+                        self.decimal_columns.add(i)
+            if not pending:
+                break
+        if not convert:
+            return rows
+
+        normalized = []
+        for row in rows:
+            row = list(row)
+            for i in convert:
+                row[i] = _to_sqlite(row[i])
+            normalized.append(tuple(row))
+        return normalized
+
+    def append(self, rows):
+        if self.truncated or not rows:
+            return
+        with self._lock:
+            rows = self._normalize(rows)
+            if not self.spilled:
+                size = sum(_row_size(r) for r in rows)
+                if self.store.reserve_memory(size, self):
+                    self._rows.extend(rows)
+                    self.memory_bytes += size
+                    self.row_count += len(rows)
+                    return
+                self._spill()
+
+            self._db.executemany(
+                f"INSERT INTO r VALUES ({', '.join('?' for _ in self.columns)})",
+                ([_to_sqlite(v) for v in row] for row in rows),
+            )
+            self._db.commit()
+            self.row_count += len(rows)
+            if not self.store.check_disk(self):
+                self.truncated = True
+
+    def spill(self):
+        """
+        Moves the rows held in memory to disk unless another thread is using
+        the handle. Returns True if memory was freed.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if self.spilled or not self._rows:
+                return False
+            self._spill()
+            return True
+        finally:
+            self._lock.release()
+
+    def _spill(self):
+        # The pid lets a later process tell files left by a crash from live ones.
+        self._path = os.path.join(self.store.directory, f"{os.getpid()}-{self.id}.sqlite")
+        self._db = sqlite3.connect(self._path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute(f"PRAGMA mmap_size={self.store.disk_quota}")
+        cols = ", ".join(f"c{i}" for i in range(len(self.columns)))
+        self._db.execute(f"CREATE TABLE r ({cols})")
+        if self._rows:
+            self._db.executemany(
+                f"INSERT INTO r VALUES ({', '.join('?' for _ in self.columns)})",
+                ([_to_sqlite(v) for v in row] for row in self._rows),
+            )
+            self._db.commit()
+        self.store.release_memory(self.memory_bytes)
+        self._rows = []
+        self.memory_bytes = 0
+        logging.info(f"Result {self.id} spilled to {self._path}")
+
+    # ------------------ Reading ------------------
+    def _column_index(self, column):
+        if column is None or column == "":
+            return None
+        if column in self.columns:
+            index = self.columns.index(column)
+        elif isinstance(column, int) or str(column).isdigit():
+            index = int(column)
+        else:
+            raise ValueError(f"Unknown column: {column}")
+        if not 0 <= index < len(self.columns):
+            raise ValueError(f"Unknown column: {column}")
+        return index
+
+    def page(self, offset=0, limit=100, sort=None, descending=False, filter_text=None, filter_column=None):
+        """
+        Returns (matching_row_count, rows) for one page. `filter_text` is a
+        case-insensitive substring match against `filter_column`, or against
+        every column when no column is given.
+        """
+        sort_index = self._column_index(sort)
+        filter_index = self._column_index(filter_column)
+        offset, limit = max(0, int(offset)), max(0, int(limit))
+
+        with self._lock:
+            if self.spilled:
+                return self._page_sqlite(offset, limit, sort_index, descending, filter_text, filter_index)
+
+            rows = self._rows
+            if filter_text:
+                needle = filter_text.lower()
+                targets = [filter_index] if filter_index is not None else range(len(self.columns))
+                rows = [r for r in rows if any(needle in str(r[i]).lower() for i in targets if r[i] is not None)]
+            if sort_index is not None:
+                rows = sorted(
+                    rows, key=_sort_key(sort_index, sort_index in self.decimal_columns), reverse=bool(descending)
+                )
+            return len(rows), rows[offset:offset + limit]
+
+    def _page_sqlite(self, offset, limit, sort_index, descending, filter_text, filter_index):
+        where, params = "", []
+        if filter_text:
+            targets = [filter_index] if filter_index is not None else range(len(self.columns))
+            where = "WHERE " + " OR ".join(f"CAST(c{i} AS TEXT) LIKE ? ESCAPE '\\'" for i in targets)
+            escaped = filter_text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params = [f"%{escaped}%"] * len(targets)
+
+        order = "ORDER BY rowid"
+        if sort_index is not None:
+            # Decimal text sorts by value, not character by character.
+            column = f"CAST(c{sort_index} AS REAL)" if sort_index in self.decimal_columns else f"c{sort_index}"
+            order = f"ORDER BY {column} {'DESC' if descending else 'ASC'}, rowid"
+
+        total = self._db.execute(f"SELECT COUNT(*) FROM r {where}", params).fetchone()[0]
+        rows = self._db.execute(f"SELECT * FROM r {where} {order} LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+        return total, rows
+
+    def iter_batches(self, batch_size=FETCH_BATCH_SIZE):
+        """Yields the stored rows in insertion order, `batch_size` rows at a time."""
+        if not self.spilled:
+            rows = self._rows
+            for start in range(0, len(rows), batch_size):
+                yield rows[start:start + batch_size]
+            return
+
+        # The spill table is only ever appended to, so rowids run 1..N
+        # without gaps and a batch is a rowid range (no rowid column to strip).
+        last = 0
+        while True:
+            with self._lock:
+                if self._db is None:
+                    raise ValueError(f"Result {self.id} was discarded.")
+                batch = self._db.execute(
+                    "SELECT * FROM r WHERE rowid > ? AND rowid <= ? ORDER BY rowid", (last, last + batch_size)
+                ).fetchall()
+            if not batch:
+                return
+            last += batch_size
+            yield batch
+
+    def iter_csv(self, batch_size=FETCH_BATCH_SIZE):
+        """Yields the result as CSV text, one chunk per batch."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.columns)
+        for batch in self.iter_batches(batch_size):
+            writer.writerows(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def close(self):
+        with self._lock:
+            self.store.release_memory(self.memory_bytes)
+            self._rows = []
+            self.memory_bytes = 0
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            if self._path and os.path.exists(self._path):
+                os.remove(self._path)
+
+
+# -----------------------------
+# Result Store
+# -----------------------------
+class ResultStore:
+    """
+    Keeps recent result sets addressable by handle id. Old handles are
+    evicted least-recently-used first, when there are more than `max_handles`
+    or when the spill files together exceed `disk_quota` bytes. When the
+    memory budget is full, the least-recently-used in-memory results are
+    spilled to disk to make room for new rows.
+
+    Spill files left in `directory` by a process that no longer runs are
+    removed when a store is created.
+    """
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, disk_quota=DEFAULT_DISK_QUOTA,
+                 max_handles=DEFAULT_MAX_HANDLES, directory=None):
+        self.memory_budget = memory_budget
+        self.disk_quota = disk_quota
+        self.max_handles = max_handles
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "querycrafter_results")
+        os.makedirs(self.directory, exist_ok=True)
+        self.memory_used = 0
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweep()
+
+    def _sweep(self):
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".sqlite"):
+                continue
+            pid = name.partition("-")[0]
+            if pid.isdigit() and (int(pid) == os.getpid() or _process_alive(int(pid))):
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            logging.info(f"Removed {removed} spill file(s) left in {self.directory}")
+
+    # ------------------ Budgets ------------------
+    def reserve_memory(self, size, requester=None):
+        """
+        Reserves `size` bytes of row memory for `requester`, spilling other
+        in-memory handles least-recently-used first if the budget is full.
+        False if the rows still do not fit.
+        """
+        if size > self.memory_budget:
+            return False
+        while True:
+            with self._lock:
+                if self.memory_used + size <= self.memory_budget:
+                    self.memory_used += size
+                    return True
+                victims = [h for h in self._handles.values() if h is not requester and h.memory_bytes]
+            victim = next((h for h in victims if h.spill()), None)
+            if victim is None:
+                return False
+            # The spilled rows now count against the disk quota; the
+            # requester is still being written, so it is never the one evicted.
+            self.check_disk(requester)
+
+    def release_memory(self, size):
+        with self._lock:
+            self.memory_used = max(0, self.memory_used - size)
+
+    def check_disk(self, growing):
+        """Evicts old handles until spill files fit the quota. False if `growing` alone is too big."""
+        while True:
+            with self._lock:
+                used = sum(h.disk_bytes for h in self._handles.values())
+                if used <= self.disk_quota:
+                    return True
+                victim = next((h for h in self._handles.values() if h is not growing), None)
+            if victim is None:
+                logging.warning(f"Result {growing.id} exceeds the disk quota; truncating.")
+                return False
+            self.discard(victim.id)
+
+    # ------------------ Handles ------------------
+    def create(self, columns, batches=()):
+        handle = ResultHandle(self, columns)
+        with self._lock:
+            self._handles[handle.id] = handle
+        for batch in batches:
+            handle.append(batch)
+            if handle.truncated:
+                break
+        self._evict()
+        return handle
+
+    def from_cursor(self, cursor, batch_size=FETCH_BATCH_SIZE):
+        """Stores the cursor's pending result set, fetching it in batches."""
+        columns = [desc[0] for desc in cursor.description]
+
+        def batches():
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+
+        handle = self.create(columns, batches())
+        if handle.truncated:
+            # Drain the rest so the connection can be reused.
+            while cursor.fetchmany(batch_size):
+                pass
+        return handle
+
+    def get(self, handle_id):
+        """Returns the handle and marks it as recently used. Raises KeyError if evicted."""
+        with self._lock:
+            handle = self._handles[handle_id]
+            self._handles.move_to_end(handle_id)
+            return handle
+
+    def discard(self, handle_id):
+        with self._lock:
+            handle = self._handles.pop(handle_id, None)
+        if handle:
+            handle.close()
+
+    def _evict(self):
+        while True:
+            with self._lock:
+                if len(self._handles) <= self.max_handles:
+                    return
+                handle_id = next(iter(self._handles))
+            self.discard(handle_id)
+
+    def close(self):
+        for handle_id in list(self._handles):
+            self.discard(handle_id)
@@ -0,0 +1,228 @@
+import math
+import time
+import decimal
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+
+SUMMARY_BATCH_SIZE = 250000
+QUANTILE_SAMPLE_SIZE = 100000
+TOP_K = 5
+MAX_TRACKED_VALUES = 10000
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _plain(value):
+    """Converts numpy/pandas scalars into JSON-friendly Python values."""
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    if isinstance(value, (int, float, str, bool)):
+        return value
+    return str(value)
+
+
+def _is_numeric(column):
+    """True if the first non-null values of `column` are all numbers."""
+    checked = 0
+    for value in column:
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float, decimal.Decimal, np.number)):
+            return False
+        checked += 1
+        if checked >= 1000:
+            break
+    return checked > 0
+
+
+def _numbers(batch, get, column=None):
+    """One column as float64 with NaN for NULL; raises for non-numeric values."""
+    if column is None:
+        try:
+            # Straight from the rows without an intermediate list; fails on the first NULL.
+            return np.fromiter(map(get, batch), dtype=np.float64, count=len(batch))
+        except TypeError:
+            column = list(map(get, batch))
+    # None becomes NaN, so the null mask comes for free.
+    return np.array(column, dtype=np.float64)
+
+
+class _ColumnStats:
+    """Mergeable per-column accumulator; each batch is folded in with vectorized kernels."""
+
+    def __init__(self, name, rng):
+        self.name = name
+        self.rng = rng
+        self.kind = None
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.seen = 0
+        self.sample = np.empty(0)
+        self.sample_keys = np.empty(0)
+        self.top = pd.Series(dtype=np.int64)
+
+    def add(self, batch, index):
+        """Folds column `index` of one batch of result rows into the totals."""
+        get = itemgetter(index)
+        column = None
+        if self.kind is None:
+            column = list(map(get, batch))
+            if any(v is not None for v in column):
+                self.kind = "numeric" if _is_numeric(column) else "text"
+
+        values = None
+        if self.kind == "numeric":
+            try:
+                values = _numbers(batch, get, column)
+            except (TypeError, ValueError):
+                # A later batch held non-numbers; report the column as text from here on.
+                self.kind = "text"
+                self.min = None if self.min is None else str(_plain(self.min))
+                self.max = None if self.max is None else str(_plain(self.max))
+
+        if values is not None:
+            nulls = np.isnan(values)
+            present = values[~nulls]
+            self.nulls += int(nulls.sum())
+            if len(present) == 0:
+                return
+            self._merge_moments(present)
+            low, high = float(present.min()), float(present.max())
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+            self._sample(present)
+        else:
+            values = np.array(list(map(get, batch)) if column is None else column, dtype=object)
+            nulls = pd.isna(values)
+            present = values[~nulls]
+            self.nulls += int(nulls.sum())
+            self.count += len(present)
+            if len(present) == 0:
+                return
+            try:
+                low, high = present.min(), present.max()
+            except TypeError:
+                # Mixed types (e.g. dates and strings) only compare as text.
+                text = [str(v) for v in present]
+                low, high = min(text), max(text)
+            low, high = str(low), str(high)
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+
+        if self.top is not None:
+            self._count_values(pd.Series(present, dtype=present.dtype, copy=False))
+
+    def _merge_moments(self, values):
+        # Mean and sum of squared deviations of the batch, merged into the
+        # running ones with Chan et al.'s update. Sums of squares would cancel
+        # catastrophically for large values with a small spread (timestamps).
+        count = len(values)
+        mean = float(values.mean())
+        m2 = float(np.square(values - mean).sum())
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def _count_values(self, present):
+        if self.top.empty and len(present) > 2 * MAX_TRACKED_VALUES:
+            # Probe a slice first so a unique column is caught before paying
+            # for a full value_counts over the batch.
+            if present.iloc[:2 * MAX_TRACKED_VALUES].nunique() > MAX_TRACKED_VALUES:
+                self.top = None
+                return
+        counts = present.value_counts()
+        if len(counts) > MAX_TRACKED_VALUES and len(counts) > len(present) // 2:
+            # Mostly unique (ids, measurements): top values carry no signal
+            # and tracking them would dominate the run time.
+            self.top = None
+            return
+        counts = counts.nlargest(MAX_TRACKED_VALUES)
+        self.top = counts if self.top.empty else self.top.add(counts, fill_value=0)
+        if len(self.top) > MAX_TRACKED_VALUES:
+            self.top = self.top.nlargest(MAX_TRACKED_VALUES)
+
+    def _sample(self, values):
+        # Bottom-k random keys: keeping the k smallest keys across all batches
+        # gives a uniform sample of everything seen so far.
+        self.seen += len(values)
+        keys = self.rng.random(len(values))
+        values = np.concatenate([self.sample, values])
+        keys = np.concatenate([self.sample_keys, keys])
+        if len(values) > QUANTILE_SAMPLE_SIZE:
+            keep = np.argpartition(keys, QUANTILE_SAMPLE_SIZE)[:QUANTILE_SAMPLE_SIZE]
+            values, keys = values[keep], keys[keep]
+        self.sample, self.sample_keys = values, keys
+
+    def summary(self):
+        rows = self.count + self.nulls
+        result = {
+            "column": self.name,
+            "type": self.kind or "empty",
+            "count": self.count,
+            "nulls": self.nulls,
+            "null_ratio": round(self.nulls / rows, 4) if rows else None,
+            "min": _plain(self.min),
+            "max": _plain(self.max),
+            "top": None if self.top is None else [[str(_plain(v)), int(c)] for v, c in self.top.nlargest(TOP_K).items()],
+            "distinct_at_least": None if self.top is None else int(len(self.top)),
+        }
+        if self.kind == "numeric" and self.count:
+            result["mean"] = _plain(self.mean)
+            result["std"] = _plain(math.sqrt(self.m2 / self.count))
+            result["quantiles"] = {
+                f"p{int(q * 100)}": _plain(v)
+                for q, v in zip(QUANTILES, np.quantile(self.sample, QUANTILES))
+            }
+            result["quantiles_exact"] = self.seen <= QUANTILE_SAMPLE_SIZE
+        return result
+
+
+def iter_summary(handle, batch_size=SUMMARY_BATCH_SIZE, seed=None):
+    """
+    Computes column summaries (counts, nulls, min/max, mean/std, quantiles,
+    top values) over a stored result, batch by batch, yielding the summary
+    so far after each batch. The last summary yielded has "done" set.
+    Quantiles come from a uniform sample of up to QUANTILE_SAMPLE_SIZE
+    values per column and are exact below that.
+    """
+    rng = np.random.default_rng(seed)
+    stats = [_ColumnStats(name, rng) for name in handle.columns]
+    # The store keeps DECIMAL values as text to preserve their digits.
+    for i in handle.decimal_columns:
+        stats[i].kind = "numeric"
+    started = time.perf_counter()
+    rows_done = 0
+
+    def snapshot(done):
+        return {
+            "rows_done": rows_done,
+            "row_count": handle.row_count,
+            "done": done,
+            "elapsed": round(time.perf_counter() - started, 3),
+            "columns": [s.summary() for s in stats],
+        }
+
+    for batch in handle.iter_batches(batch_size):
+        # Each column is pulled out with itemgetter, which is far cheaper than
+        # building a DataFrame from row tuples (or zip(*batch), which
+        # allocates an iterator per row), and becomes one NumPy array.
+        for i, column_stats in enumerate(stats):
+            column_stats.add(batch, i)
+        rows_done += len(batch)
+        if rows_done < handle.row_count:
+            yield snapshot(False)
+
+    yield snapshot(True)
+
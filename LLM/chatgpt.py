@@ -1,6 +1,7 @@
 import os
 import json
 from openai import OpenAI
+from LLM.sql_repair import clean_sql, generate_with_repair
 
 # -----------------------------
 # Common Paths
@@ -16,37 +17,47 @@ def get_llm_settings():
     with open(LLM_SETTINGS_FILE, "r") as f:
         return json.load(f)
 
-def chat_with_gpt(prompt, api_key, model="gpt-4o-mini", temperature=0.2):
-    """
-    Sends an SQL-related question or instruction to GPT and receives a clean SQL query as output.
-    """
-    try:
-        client = OpenAI(api_key=api_key)
+SYSTEM_PROMPT = (
+    "You are a senior SQL expert and database architect. "
+    "Your only task is to generate valid, executable SQL queries based on the user's request. "
+    "You must not include explanations, comments, markdown formatting, or text outside the SQL query. "
+    "Always assume the database is MySQL unless otherwise stated. "
+    "If a query can vary depending on table or column names, use realistic placeholder names."
+)
+
+def _asker(api_key, model, temperature):
+    """Returns a function that sends a message list to GPT and returns the reply text."""
+    client = OpenAI(api_key=api_key)
+
+    def ask(messages):
         response = client.chat.completions.create(
             model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a senior SQL expert and database architect. "
-                        "Your only task is to generate valid, executable SQL queries based on the user's request. "
-                        "You must not include explanations, comments, markdown formatting, or text outside the SQL query. "
-                        "Always assume the database is MySQL unless otherwise stated. "
-                        "If a query can vary depending on table or column names, use realistic placeholder names."
-                    ),
-                },
-                {"role": "user", "content": prompt.strip()},
-            ],
+            messages=[{"role": "system", "content": SYSTEM_PROMPT}] + messages,
             temperature=temperature,
             max_tokens=300,
         )
-        result = response.choices[0].message.content.strip()
-        if result.startswith("```"):
-            result = result.strip("`").replace("sql", "").strip()
-        return result
+        return response.choices[0].message.content
+    return ask
+
+def chat_with_gpt(prompt, api_key, model="gpt-4o-mini", temperature=0.2):
+    """
+    Sends an SQL-related question or instruction to GPT and receives a clean SQL query as output.
+    """
+    try:
+        ask = _asker(api_key, model, temperature)
+        return clean_sql(ask([{"role": "user", "content": prompt.strip()}]))
     except Exception as e:
         return f"Error: {e}"
 
+def generate_sql(prompt, structure, api_key, model="gpt-4o-mini", temperature=0.2, max_attempts=3):
+    """
+    Like chat_with_gpt, but validates the SQL against `structure` locally and
+    feeds any errors back to GPT, up to `max_attempts` calls. Returns
+    (sql, stats); raises on API errors.
+    """
+    ask = _asker(api_key, model, temperature)
+    return generate_with_repair(ask, prompt, structure, max_attempts=max_attempts)
+
 # Example usage (optional, for testing)
 if __name__ == "__main__":
     settings = get_llm_settings()
@@ -0,0 +1,169 @@
+import re
+import threading
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError, SqlglotError
+
+from Databases.MySQL.schema import iter_tables
+
+
+_FENCE_RE = re.compile(r"```[ \t]*(?:sql|mysql)?[ \t]*\n?(.*?)```", re.IGNORECASE | re.DOTALL)
+
+# Running totals across all generations, reported alongside each result.
+REPAIR_STATS = {"generated": 0, "valid_first_try": 0, "repaired": 0, "failed": 0, "llm_calls": 0}
+_stats_lock = threading.Lock()
+
+
+def clean_sql(text):
+    """Extracts the SQL from an LLM reply, removing a surrounding markdown fence if present."""
+    text = text.strip()
+    match = _FENCE_RE.search(text)
+    if match:
+        return match.group(1).strip()
+    return text.strip("`").strip()
+
+
+# -----------------------------
+# Validation
+# -----------------------------
+def _schema_index(structure):
+    return {
+        table.lower(): {column.lower() for column, _ in columns}
+        for table, columns in iter_tables(structure)
+    }
+
+
+def _check_statement(statement, schema):
+    errors = []
+    cte_names = {cte.alias_or_name.lower() for cte in statement.find_all(exp.CTE)}
+
+    # alias/table name -> real table name, for tables that exist in the schema.
+    sources = {}
+    # CTEs and subqueries introduce columns that are not in the schema, so
+    # unqualified columns are not checked when they are present.
+    has_derived = bool(cte_names) or statement.find(exp.Subquery) is not None
+    for table in statement.find_all(exp.Table):
+        name = table.name.lower()
+        if not name or name in cte_names or name == "dual":
+            continue
+        if table.args.get("db") and table.args["db"].name.lower() == "information_schema":
+            has_derived = True
+            continue
+        if name not in schema:
+            errors.append(f"Unknown table `{table.name}`.")
+            continue
+        sources[name] = name
+        if table.alias:
+            sources[table.alias.lower()] = name
+
+    select_aliases = {a.alias.lower() for a in statement.find_all(exp.Alias)}
+
+    for column in statement.find_all(exp.Column):
+        name = column.name.lower()
+        if not name or isinstance(column.this, exp.Star):
+            continue
+        qualifier = column.table.lower() if column.table else None
+        if qualifier:
+            if qualifier in sources:
+                table = sources[qualifier]
+                if name not in schema[table]:
+                    errors.append(f"Unknown column `{column.table}.{column.name}` (table `{table}` has no such column).")
+            elif qualifier not in cte_names and not has_derived:
+                errors.append(f"Unknown table or alias `{column.table}` in `{column.sql(dialect='mysql')}`.")
+            continue
+
+        # Unqualified columns are only checked when every source is a known table.
+        if has_derived or not sources or name in select_aliases:
+            continue
+        if not any(name in schema[t] for t in set(sources.values())):
+            tables = ", ".join(sorted(set(sources.values())))
+            errors.append(f"Unknown column `{column.name}` (not found in {tables}).")
+
+    return errors
+
+
+def validate_sql(sql, structure):
+    """
+    Parses `sql` with the MySQL dialect and checks table and column
+    references against the saved DB structure. Returns a list of error
+    messages, empty when the query looks valid.
+    """
+    if not sql.strip():
+        return ["The reply did not contain a SQL query."]
+    try:
+        statements = [s for s in sqlglot.parse(sql, read="mysql") if s is not None]
+    except ParseError as e:
+        details = [
+            f"line {err.get('line')}, column {err.get('col')}: {err.get('description')}"
+            for err in e.errors
+        ]
+        return ["Syntax error: " + ("; ".join(details) or str(e))]
+    except SqlglotError as e:
+        # The tokenizer raises TokenError, e.g. for an unterminated string.
+        return [f"Syntax error: {e}"]
+
+    # The parser accepts a bare expression such as `SELEC * FRM t` (read as
+    # `SELEC * FRM AS t`); a top-level expression is never a statement.
+    for statement in statements:
+        if isinstance(statement, (exp.Alias, exp.Condition)):
+            return [f"Syntax error: `{statement.sql(dialect='mysql')}` is not a SQL statement."]
+
+    schema = _schema_index(structure)
+    if not schema:
+        return []
+
+    errors = []
+    for statement in statements:
+        errors.extend(_check_statement(statement, schema))
+    # Keep order but drop duplicates, e.g. the same bad column used twice.
+    return list(dict.fromkeys(errors))
+
+
+# -----------------------------
+# Repair Loop
+# -----------------------------
+def generate_with_repair(ask, prompt, structure, max_attempts=3):
+    """
+    Calls `ask(messages)` for a query and validates it locally. Each failed
+    validation sends the exact errors back to the model, up to
+    `max_attempts` LLM calls in total. Returns (sql, stats); `ask` may raise,
+    which propagates to the caller.
+    """
+    messages = [{"role": "user", "content": prompt.strip()}]
+    sql, errors = "", []
+    attempts = 0
+    for attempts in range(1, max_attempts + 1):
+        sql = clean_sql(ask(messages))
+        errors = validate_sql(sql, structure)
+        if not errors:
+            break
+        messages.append({"role": "assistant", "content": sql})
+        messages.append({
+            "role": "user",
+            "content": (
+                "That query failed validation against the schema:\n- "
+                + "\n- ".join(errors)
+                + "\nReturn only the corrected SQL query."
+            ),
+        })
+
+    with _stats_lock:
+        REPAIR_STATS["generated"] += 1
+        REPAIR_STATS["llm_calls"] += attempts
+        if errors:
+            REPAIR_STATS["failed"] += 1
+        elif attempts == 1:
+            REPAIR_STATS["valid_first_try"] += 1
+        else:
+            REPAIR_STATS["repaired"] += 1
+        totals = dict(REPAIR_STATS)
+
+    stats = {
+        "attempts": attempts,
+        "repairs": attempts - 1,
+        "valid": not errors,
+        "errors": errors,
+        "totals": totals,
+    }
+    return sql, stats
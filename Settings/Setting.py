@@ -6,6 +6,7 @@ from PyQt6.QtWidgets import (
     QVBoxLayout, QFormLayout, QMessageBox, QStackedWidget, QLabel, QHBoxLayout
 )
 from Databases.MySQL.connection import DatabaseManager
+from Databases.MySQL.router import parse_replicas
 
 
 # -----------------------------
@@ -26,7 +27,7 @@ class DatabaseSettingsPage(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("⚙️ Database Settings")
-        self.setFixedSize(400, 270)
+        self.setFixedSize(400, 310)
         self.setStyleSheet(self._style())
 
         # Inputs
@@ -36,6 +37,8 @@ class DatabaseSettingsPage(QWidget):
         self.pass_input = QLineEdit()
         self.pass_input.setEchoMode(QLineEdit.EchoMode.Password)
         self.db_input = QLineEdit()
+        self.replicas_input = QLineEdit()
+        self.replicas_input.setPlaceholderText("host:port, host:port (optional)")
 
         # Load saved data
         self.load_settings()
@@ -54,6 +57,7 @@ class DatabaseSettingsPage(QWidget):
         form.addRow("User:", self.user_input)
         form.addRow("Password:", self.pass_input)
         form.addRow("Database:", self.db_input)
+        form.addRow("Read Replicas:", self.replicas_input)
 
         layout = QVBoxLayout()
         layout.addLayout(form)
@@ -93,14 +97,29 @@ class DatabaseSettingsPage(QWidget):
                 self.user_input.setText(data.get("user", ""))
                 self.pass_input.setText(data.get("password", ""))
                 self.db_input.setText(data.get("database", ""))
+                self.replicas_input.setText(", ".join(
+                    f"{r['host']}:{r.get('port', 3306)}" for r in data.get("replicas", [])
+                ))
 
     def save_settings(self):
+        port = self.port_input.text().strip()
+        if not port.isdigit() or not 0 < int(port) < 65536:
+            QMessageBox.warning(self, "Invalid Port", "⚠️ Port must be a number between 1 and 65535.")
+            return
+
+        try:
+            replicas = parse_replicas(self.replicas_input.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Read Replicas", f"⚠️ {e}")
+            return
+
         data = {
             "host": self.host_input.text(),
-            "port": self.port_input.text(),
+            "port": port,
             "user": self.user_input.text(),
             "password": self.pass_input.text(),
             "database": self.db_input.text(),
+            "replicas": replicas,
         }
         with open(DB_SETTINGS_FILE, "w") as f:
             json.dump(data, f, indent=4)
@@ -5,11 +5,164 @@ import mysql.connector
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
     QTextEdit, QPushButton, QTableWidget, QTableWidgetItem,
-    QMessageBox, QHBoxLayout
+    QMessageBox, QHBoxLayout, QLineEdit, QLabel, QDialog, QCompleter
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtGui import QStandardItemModel, QStandardItem, QTextCursor
 from Settings.Setting import MainWindow as SettingsWindow
-from LLM.chatgpt import chat_with_gpt, get_llm_settings
+from LLM.chatgpt import generate_sql, get_llm_settings
+from Databases.MySQL.profiler import ColumnProfiler, profile_snippets
+from Databases.result_store import ResultStore
+from Databases.result_summary import iter_summary, QUANTILES
+from Databases.MySQL.schema import write_json_atomic
+from Databases.MySQL.router import ReplicaRouter
+from Databases.MySQL.autocomplete import SchemaCompleter, parse_context, looks_like_sql
+
+PAGE_SIZE = 500
+SUMMARY_HEADERS = ["Column", "Type", "Count", "Nulls", "Null %", "Min", "Max", "Mean", "Std"] + [
+    f"p{int(q * 100)}" for q in QUANTILES
+] + ["Top Values"]
+
+
+def _format_stat(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+# ------------------ SQL Editor ------------------
+class SqlEditor(QTextEdit):
+    """
+    Query editor with schema-aware completion. Suggestions come from a
+    SchemaCompleter as you type once the text looks like SQL (the box also
+    takes natural-language prompts); Ctrl+Space opens them on demand.
+    """
+
+    def __init__(self, completions, parent=None):
+        super().__init__(parent)
+        self.completions = completions
+        self.prefix = ""
+        self.model = QStandardItemModel(self)
+        self.completer = QCompleter(self.model, self)
+        self.completer.setWidget(self)
+        # The engine has already filtered and ranked (including fuzzy matches),
+        # so the popup shows its list as-is.
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.completer.activated.connect(self.insert_completion)
+
+    def insert_completion(self, text):
+        cursor = self.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.Left, QTextCursor.MoveMode.KeepAnchor, len(self.prefix))
+        cursor.insertText(text)
+        self.setTextCursor(cursor)
+
+    def keyPressEvent(self, event):
+        popup = self.completer.popup()
+        if popup.isVisible() and event.key() in (
+            Qt.Key.Key_Enter, Qt.Key.Key_Return, Qt.Key.Key_Tab, Qt.Key.Key_Backtab, Qt.Key.Key_Escape
+        ):
+            # Let the completer accept or dismiss the suggestion.
+            event.ignore()
+            return
+
+        forced = event.key() == Qt.Key.Key_Space and bool(event.modifiers() & Qt.KeyboardModifier.ControlModifier)
+        if not forced:
+            super().keyPressEvent(event)
+            if not event.text():
+                return
+        self.show_completions(forced)
+
+    def show_completions(self, forced=False):
+        text = self.toPlainText()
+        position = self.textCursor().position()
+        self.prefix = parse_context(text, position)[1]
+        popup = self.completer.popup()
+        if not forced and (not looks_like_sql(text) or not (self.prefix or text[:position].endswith("."))):
+            popup.hide()
+            return
+
+        items = self.completions.complete(text, position)
+        if not items or (len(items) == 1 and items[0]["text"] == self.prefix):
+            popup.hide()
+            return
+
+        self.model.clear()
+        for item in items:
+            row = QStandardItem(item["text"])
+            row.setToolTip(f"{item['kind']}: {item['detail']}")
+            self.model.appendRow(row)
+        popup.setCurrentIndex(self.completer.completionModel().index(0, 0))
+        rect = self.cursorRect()
+        rect.setWidth(popup.sizeHintForColumn(0) + popup.verticalScrollBar().sizeHint().width())
+        self.completer.complete(rect)
+
+
+# ------------------ Result Summary ------------------
+class SummaryWorker(QThread):
+    """Summarizes a stored result off the UI thread, emitting every partial summary."""
+
+    progress = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, handle, parent=None):
+        super().__init__(parent)
+        self.handle = handle
+
+    def run(self):
+        try:
+            for summary in iter_summary(self.handle):
+                # Checked between batches; see QueryCrafterApp.stop_summary.
+                if self.isInterruptionRequested():
+                    return
+                self.progress.emit(summary)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class SummaryDialog(QDialog):
+    """One row per result column, refreshed as partial summaries arrive."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("📊 Result Summary")
+        self.resize(900, 400)
+        layout = QVBoxLayout(self)
+        self.status_label = QLabel("Summarizing...")
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(SUMMARY_HEADERS))
+        self.table.setHorizontalHeaderLabels(SUMMARY_HEADERS)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.table)
+
+    def update_summary(self, summary):
+        columns = summary["columns"]
+        self.table.setRowCount(len(columns))
+        for i, column in enumerate(columns):
+            quantiles = column.get("quantiles") or {}
+            top = ", ".join(f"{value} ({count})" for value, count in column["top"] or [])
+            null_ratio = column["null_ratio"]
+            cells = [
+                column["column"],
+                column["type"],
+                column["count"],
+                column["nulls"],
+                None if null_ratio is None else f"{null_ratio * 100:.1f}",
+                column["min"],
+                column["max"],
+                column.get("mean"),
+                column.get("std"),
+            ] + [quantiles.get(f"p{int(q * 100)}") for q in QUANTILES] + [top]
+            for j, value in enumerate(cells):
+                self.table.setItem(i, j, QTableWidgetItem(_format_stat(value)))
+        self.table.resizeColumnsToContents()
+
+        state = "Done" if summary["done"] else "Summarizing"
+        self.status_label.setText(
+            f"{state}: {summary['rows_done']:,} of {summary['row_count']:,} rows in {summary['elapsed']}s"
+            + ("" if summary["done"] else " (partial)")
+        )
 
 
 class QueryCrafterApp(QMainWindow):
@@ -20,6 +173,19 @@ class QueryCrafterApp(QMainWindow):
 
         self.connection = None
         self.cursor = None
+        self.db_settings = None
+        self.router = None
+        self.router_session = None
+        self.profiler = ColumnProfiler(connect=self.open_connection)
+        self.results = ResultStore()
+        self.result = None
+        self.page_offset = 0
+        self.sort_column = None
+        self.sort_descending = False
+        self.summary_worker = None
+        self.summary_dialog = None
+        self.completions = SchemaCompleter()
+        self.completions.refresh()
 
         self.init_ui()
         self.connect_to_database()
@@ -31,7 +197,7 @@ class QueryCrafterApp(QMainWindow):
         layout = QVBoxLayout(central)
 
         # --- Query Input Area ---
-        self.query_input = QTextEdit()
+        self.query_input = SqlEditor(self.completions)
         self.query_input.setPlaceholderText("Write or paste your SQL query here...")
         self.query_input.setStyleSheet("""
             QTextEdit {
@@ -50,11 +216,12 @@ class QueryCrafterApp(QMainWindow):
         self.run_btn = QPushButton("▶️ Run Query")
         self.db_structure_btn = QPushButton("Show DB Structure")
         self.generate_query_btn = QPushButton("Generate Query")
+        self.summary_btn = QPushButton("📊 Summary")
         self.clear_btn = QPushButton("🧹 Clear")
         self.settings_btn = QPushButton("⚙️ Settings")
         self.exit_btn = QPushButton("❌ Exit")
 
-        for btn in [self.run_btn, self.db_structure_btn, self.generate_query_btn, self.clear_btn, self.settings_btn, self.exit_btn]:
+        for btn in [self.run_btn, self.db_structure_btn, self.generate_query_btn, self.summary_btn, self.clear_btn, self.settings_btn, self.exit_btn]:
             btn.setStyleSheet("""
                 QPushButton {
                     background-color: #555;
@@ -68,6 +235,7 @@ class QueryCrafterApp(QMainWindow):
         btn_layout.addWidget(self.run_btn)
         btn_layout.addWidget(self.db_structure_btn)
         btn_layout.addWidget(self.generate_query_btn)
+        btn_layout.addWidget(self.summary_btn)
         btn_layout.addWidget(self.clear_btn)
         btn_layout.addWidget(self.settings_btn)
         btn_layout.addWidget(self.exit_btn)
@@ -90,15 +258,46 @@ class QueryCrafterApp(QMainWindow):
         """)
         layout.addWidget(self.table)
 
+        # --- Result Paging ---
+        page_layout = QHBoxLayout()
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter results...")
+        self.prev_btn = QPushButton("◀ Prev")
+        self.next_btn = QPushButton("Next ▶")
+        self.page_label = QLabel("")
+        page_layout.addWidget(self.filter_input)
+        page_layout.addWidget(self.prev_btn)
+        page_layout.addWidget(self.next_btn)
+        page_layout.addWidget(self.page_label)
+        layout.addLayout(page_layout)
+
+        self.prev_btn.clicked.connect(lambda: self.change_page(-1))
+        self.next_btn.clicked.connect(lambda: self.change_page(1))
+        self.filter_input.returnPressed.connect(lambda: self.change_page(0, reset=True))
+        self.table.horizontalHeader().sectionClicked.connect(self.sort_results)
+
         # --- Button Connections ---
         self.run_btn.clicked.connect(self.execute_query)
         self.db_structure_btn.clicked.connect(self.show_db_structure)
         self.generate_query_btn.clicked.connect(self.generate_query)
+        self.summary_btn.clicked.connect(self.summarize_result)
         self.clear_btn.clicked.connect(self.clear_query)
         self.settings_btn.clicked.connect(self.open_settings)
         self.exit_btn.clicked.connect(self.close_app)
 
     # ------------------ DB Connection ------------------
+    def open_connection(self):
+        """Opens a separate connection, used by background workers."""
+        if not self.db_settings:
+            return None
+        return mysql.connector.connect(
+            host=self.db_settings["host"],
+            port=self.db_settings["port"],
+            user=self.db_settings["user"],
+            password=self.db_settings["password"],
+            database=self.db_settings["database"]
+        )
+
     def connect_to_database(self):
         settings_path = os.path.join(os.path.dirname(__file__), "SavedData", "db_settings.json")
         if not os.path.exists(settings_path):
@@ -109,13 +308,35 @@ class QueryCrafterApp(QMainWindow):
             with open(settings_path, "r") as f:
                 data = json.load(f)
 
+            port = str(data.get("port") or 3306).strip()
+            if not port.isdigit() or not 0 < int(port) < 65536:
+                QMessageBox.warning(self, "Invalid Port", f"⚠️ Invalid database port {port!r}. Fix it in Settings.")
+                return
+            # The router's primary is also the failover target, so both must use this port.
+            data["port"] = int(port)
+
             self.connection = mysql.connector.connect(
                 host=data["host"],
+                port=data["port"],
                 user=data["user"],
                 password=data["password"],
                 database=data["database"]
             )
             self.cursor = self.connection.cursor()
+            self.db_settings = data
+            if data.get("replicas"):
+                # Read-only queries go to a replica; writes and transactions stay on self.connection.
+                self.router = ReplicaRouter(
+                    {
+                        "host": data["host"],
+                        "port": data["port"],
+                        "user": data["user"],
+                        "password": data["password"],
+                        "database": data["database"],
+                    },
+                    data["replicas"],
+                )
+                self.router_session = self.router.session()
             QMessageBox.information(self, "Connected", "✅ Database connected successfully!")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"❌ Failed to connect:\n{e}")
@@ -132,13 +353,18 @@ class QueryCrafterApp(QMainWindow):
             return
 
         try:
+            endpoint = self.router_session.route(query) if self.router else None
+            if endpoint is not None and endpoint.role == "replica":
+                self.store_result(self.router.run_on(endpoint, self._read_on_replica(query)))
+                self.statusBar().showMessage(f"Read served by {endpoint.config['host']}:{endpoint.config['port']}")
+                QMessageBox.information(self, "Success", f"✅ {self.result.row_count} rows fetched.")
+                return
+
             self.cursor.execute(query)
 
             if self.cursor.with_rows:
-                rows = self.cursor.fetchall()
-                columns = [desc[0] for desc in self.cursor.description]
-                self.show_results(columns, rows)
-                QMessageBox.information(self, "Success", f"✅ {len(rows)} rows fetched.")
+                self.store_result(self.results.from_cursor(self.cursor))
+                QMessageBox.information(self, "Success", f"✅ {self.result.row_count} rows fetched.")
             else:
                 self.connection.commit()
                 QMessageBox.information(self, "Executed", "✅ Query executed successfully (no data returned).")
@@ -146,6 +372,32 @@ class QueryCrafterApp(QMainWindow):
         except mysql.connector.Error as err:
             QMessageBox.critical(self, "Query Error", f"⚠️ {err}")
 
+    def _read_on_replica(self, query):
+        def read(connection, endpoint):
+            cursor = connection.cursor()
+            try:
+                cursor.execute(query)
+                return self.results.from_cursor(cursor)
+            finally:
+                cursor.close()
+        return read
+
+    def discard_result(self):
+        """Drops the stored result, stopping a summary that may still be reading it."""
+        if self.result:
+            self.stop_summary()
+            self.results.discard(self.result.id)
+            self.result = None
+
+    def store_result(self, handle):
+        self.discard_result()
+        self.result = handle
+        self.page_offset = 0
+        self.sort_column = None
+        self.sort_descending = False
+        self.filter_input.clear()
+        self.show_results()
+
     # ------------------ Show DB Structure ------------------
     def show_db_structure(self):
         if not self.connection or not self.cursor:
@@ -158,7 +410,7 @@ class QueryCrafterApp(QMainWindow):
             db_name = self.cursor.fetchone()[0]
 
             # Get all tables in the database
-            self.cursor.execute(f"SELECT table_name FROM information_schema.tables WHERE table_schema = '{db_name}'")
+            self.cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = %s", (db_name,))
             tables = self.cursor.fetchall()
 
             if not tables:
@@ -168,10 +420,15 @@ class QueryCrafterApp(QMainWindow):
             all_table_structures = []
             for table in tables:
                 table_name = table[0]
-                self.cursor.execute(f"SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = '{db_name}' AND table_name = '{table_name}'")
+                self.cursor.execute(
+                    "SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = %s AND table_name = %s",
+                    (db_name, table_name),
+                )
                 columns = self.cursor.fetchall()
                 all_table_structures.append((table_name, columns))
 
+            self.discard_result()
+            self.page_label.setText("")
             self.table.clear()
             self.table.setColumnCount(3)
             self.table.setHorizontalHeaderLabels(["Table Name", "Column Name", "Data Type"])
@@ -188,10 +445,15 @@ class QueryCrafterApp(QMainWindow):
             
             self.table.resizeColumnsToContents()
             try:
-                with open(os.path.join(os.path.dirname(__file__), "SavedData/db_structure.json"), "w", encoding="utf-8") as f:
-                    json.dump(all_table_structures, f, ensure_ascii=False, separators=(',', ':'))
+                write_json_atomic(
+                    os.path.join(os.path.dirname(__file__), "SavedData/db_structure.json"),
+                    all_table_structures, ensure_ascii=False, separators=(',', ':')
+                )
             except Exception as e:
                     QMessageBox.information(self, "Error", f"⚠️ {e}")
+            self.completions.update(all_table_structures)
+            # Column statistics are sampled on a separate connection so the UI stays responsive.
+            self.profiler.refresh_in_background(all_table_structures)
             QMessageBox.information(self, "Success", "✅ Database structure loaded.")
 
         except mysql.connector.Error as err:
@@ -227,20 +489,48 @@ class QueryCrafterApp(QMainWindow):
         The structure of the database is {data}.
         Please make a query for this: {question}"""
 
-        sql_query = chat_with_gpt(
-            prompt,
-            api_key=llm_settings.get("api_key"),
-            model=llm_settings.get("model"),
-            temperature=float(llm_settings.get("temperature", 0.2))
-        )
+        snippets = profile_snippets(self.profiler.profiles, data, question)
+        if snippets:
+            prompt += f"\nColumn statistics (sampled):\n{snippets}"
 
-        if sql_query.startswith("Error:"):
-            QMessageBox.critical(self, "LLM Error", sql_query)
-        else:
-            self.query_input.setPlainText(sql_query)
+        try:
+            sql_query, stats = generate_sql(
+                prompt,
+                data,
+                api_key=llm_settings.get("api_key"),
+                model=llm_settings.get("model"),
+                temperature=float(llm_settings.get("temperature", 0.2))
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "LLM Error", f"Error: {e}")
+            return
+
+        self.query_input.setPlainText(sql_query)
+        totals = stats["totals"]
+        self.statusBar().showMessage(
+            f"Generated in {stats['attempts']} LLM call(s), {stats['repairs']} repair(s). "
+            f"Session: {totals['valid_first_try']} valid first try, {totals['repaired']} repaired, {totals['failed']} failed."
+        )
+        if not stats["valid"]:
+            QMessageBox.warning(
+                self, "Unverified Query",
+                "⚠️ The generated query still fails validation:\n" + "\n".join(stats["errors"])
+            )
 
     # ------------------ Display Results ------------------
-    def show_results(self, columns, rows):
+    def show_results(self):
+        """Shows the current page of the stored result; the full result never goes into the table."""
+        if not self.result:
+            return
+        matching, rows = self.result.page(
+            self.page_offset,
+            PAGE_SIZE,
+            sort=self.sort_column,
+            descending=self.sort_descending,
+            filter_text=self.filter_input.text().strip() or None,
+        )
+        columns = self.result.columns
+
         self.table.clear()
         self.table.setColumnCount(len(columns))
         self.table.setHorizontalHeaderLabels(columns)
@@ -252,9 +542,58 @@ class QueryCrafterApp(QMainWindow):
 
         self.table.resizeColumnsToContents()
 
+        last = min(self.page_offset + PAGE_SIZE, matching)
+        label = f"Rows {self.page_offset + 1 if matching else 0}-{last} of {matching}"
+        if self.result.truncated:
+            label += " (truncated)"
+        self.page_label.setText(label)
+        self.prev_btn.setEnabled(self.page_offset > 0)
+        self.next_btn.setEnabled(last < matching)
+
+    def change_page(self, direction, reset=False):
+        if not self.result:
+            return
+        self.page_offset = 0 if reset else max(0, self.page_offset + direction * PAGE_SIZE)
+        self.show_results()
+
+    def sort_results(self, index):
+        if not self.result:
+            return
+        self.sort_descending = self.sort_column == index and not self.sort_descending
+        self.sort_column = index
+        self.page_offset = 0
+        self.show_results()
+
+    # ------------------ Result Summary ------------------
+    def summarize_result(self):
+        if not self.result:
+            QMessageBox.warning(self, "No Result", "⚠️ Run a query first.")
+            return
+        if self.summary_worker and self.summary_worker.isRunning():
+            self.summary_dialog.raise_()
+            return
+
+        self.summary_dialog = SummaryDialog(self)
+        self.summary_worker = SummaryWorker(self.result, self)
+        self.summary_worker.progress.connect(self.summary_dialog.update_summary)
+        self.summary_worker.failed.connect(
+            lambda message: QMessageBox.critical(self, "Summary Error", f"⚠️ {message}")
+        )
+        self.summary_dialog.show()
+        self.summary_worker.start()
+
+    def stop_summary(self):
+        """Stops a running summary; it exits after the batch it is on."""
+        if self.summary_worker and self.summary_worker.isRunning():
+            self.summary_worker.progress.disconnect()
+            self.summary_worker.requestInterruption()
+            self.summary_worker.wait()
+            self.summary_dialog.status_label.setText("Stopped: the result was discarded.")
     # ------------------ Utility Methods ------------------
     def clear_query(self):
         self.query_input.clear()
+        self.discard_result()
+        self.page_label.setText("")
         self.table.clear()
         self.table.setRowCount(0)
         self.table.setColumnCount(0)
@@ -264,6 +603,10 @@ class QueryCrafterApp(QMainWindow):
         self.settings_window.show()
 
     def close_app(self):
+        self.stop_summary()
+        self.results.close()
+        if self.router:
+            self.router.close()
         if self.connection and self.connection.is_connected():
             self.connection.close()
         self.close()
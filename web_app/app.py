@@ -1,19 +1,39 @@
 import os
+import sys
 import json
 import logging
 import io
+import atexit
 import pandas as pd
 import mysql.connector
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 from dotenv import load_dotenv
 from openai import OpenAI
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from Databases.MySQL.statement_cache import PreparedStatementPool
+from Databases.MySQL.profiler import ColumnProfiler, profile_snippets
+from Databases.result_store import ResultStore
+from Databases.result_summary import iter_summary
+from Databases.MySQL.classify import is_read_only
+from Databases.MySQL.router import ReplicaRouter, parse_replicas
+from LLM.sql_repair import generate_with_repair
+from web_app.singleflight import SingleFlight
+from web_app.compression import init_compression
+from Databases.MySQL.schema import write_json_atomic, schema_fingerprint
+from Databases.MySQL.autocomplete import SchemaCompleter
+
 # ------------------ Logging Setup ------------------
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # ------------------ Flask App Setup ------------------
 load_dotenv()
 app = Flask(__name__)
+init_compression(
+    app,
+    threshold=int(os.getenv("COMPRESSION_THRESHOLD", 1024)),
+    level=int(os.getenv("COMPRESSION_LEVEL", 6)),
+)
 
 # ------------------ Helper Functions ------------------
 def get_db_connection():
@@ -21,6 +41,7 @@ def get_db_connection():
     try:
         connection = mysql.connector.connect(
             host=os.getenv("DB_HOST"),
+            port=int(os.getenv("DB_PORT", 3306)),
             user=os.getenv("DB_USER"),
             password=os.getenv("DB_PASSWORD"),
             database=os.getenv("DB_DATABASE")
@@ -32,36 +53,336 @@ def get_db_connection():
         logging.error(f"Database connection failed: {err}")
         return None, None
 
+def open_background_connection():
+    """Opens a bare connection for background workers such as the column profiler."""
+    connection, cursor = get_db_connection()
+    if cursor:
+        cursor.close()
+    return connection
+
+profiler = ColumnProfiler(connect=open_background_connection)
+
+# Read-only queries go to the replicas in DB_REPLICAS ("host:port,...") when set.
+router = None
+if os.getenv("DB_REPLICAS"):
+    router = ReplicaRouter(
+        {
+            "host": os.getenv("DB_HOST"),
+            "port": int(os.getenv("DB_PORT", 3306)),
+            "user": os.getenv("DB_USER"),
+            "password": os.getenv("DB_PASSWORD"),
+            "database": os.getenv("DB_DATABASE"),
+        },
+        parse_replicas(os.getenv("DB_REPLICAS")),
+        max_lag=float(os.getenv("REPLICA_MAX_LAG", 5)),
+    )
+
+results = ResultStore(
+    memory_budget=int(os.getenv("RESULT_MEMORY_BUDGET_MB", 64)) * 1024 * 1024,
+    disk_quota=int(os.getenv("RESULT_DISK_QUOTA_MB", 1024)) * 1024 * 1024,
+    max_handles=int(os.getenv("RESULT_MAX_HANDLES", 20)),
+)
+PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", 100))
+
+# Editor completions, re-indexed whenever db_structure.json changes.
+completions = SchemaCompleter()
+
+def result_page(handle, offset=0, limit=PAGE_SIZE, sort=None, descending=False, filter_text=None):
+    """Builds the JSON payload for one page of a stored result."""
+    matching, rows = handle.page(offset, limit, sort=sort, descending=descending, filter_text=filter_text)
+    return {
+        "handle": handle.id,
+        "columns": handle.columns,
+        "rows": rows,
+        "offset": offset,
+        "limit": limit,
+        "row_count": handle.row_count,
+        "matching_rows": matching,
+        "truncated": handle.truncated,
+    }
+
+# Prepared statements live on the server per connection, so their
+# connections are pooled across requests (each request runs on a new thread).
+statement_pool = PreparedStatementPool(
+    open_background_connection,
+    size=int(os.getenv("DB_STATEMENT_POOL_SIZE", 4)),
+    max_statements=int(os.getenv("DB_STATEMENT_CACHE_SIZE", 64)),
+    auto_parameterize=os.getenv("DB_AUTO_PARAMETERIZE", "0") == "1",
+)
+atexit.register(statement_pool.close)
+
+def parse_params(raw):
+    """Parses the optional `params` form field (a JSON array)."""
+    if raw is None or raw == "":
+        return None
+    params = json.loads(raw)
+    if not isinstance(params, list):
+        raise ValueError("params must be a JSON array.")
+    return params
+
 def get_db_structure(cursor):
     """Fetches the database structure."""
     try:
         cursor.execute("SELECT DATABASE()")
         db_name = cursor.fetchone()[0]
-        cursor.execute(f"SELECT table_name FROM information_schema.tables WHERE table_schema = '{db_name}'")
+        cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = %s", (db_name,))
         tables = cursor.fetchall()
         
         all_table_structures = []
         for table in tables:
             table_name = table[0]
-            cursor.execute(f"SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = '{db_name}' AND table_name = '{table_name}'")
+            cursor.execute(
+                "SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = %s AND table_name = %s",
+                (db_name, table_name),
+            )
             columns = cursor.fetchall()
             all_table_structures.append({"table_name": table_name, "columns": columns})
         
         structure_path = os.path.join(os.path.dirname(__file__), "..", "SavedData", "db_structure.json")
-        with open(structure_path, "w") as f:
-            json.dump(all_table_structures, f, indent=4)
+        write_json_atomic(structure_path, all_table_structures, indent=4)
             
         return all_table_structures
     except mysql.connector.Error as err:
         logging.error(f"Failed to get database structure: {err}")
         return None
 
+# ------------------ Actions ------------------
+# Each action returns a plain dict so that coalesced callers can share it.
+inflight = SingleFlight()
+
+def run_query(query, params, auto):
+    """Executes a query and returns the response payload."""
+    if params is not None or auto or os.getenv("DB_AUTO_PARAMETERIZE", "0") == "1":
+        try:
+            with statement_pool.statements() as statements:
+                columns, rows = statements.execute(query, params, auto_parameterize=True if auto else None)
+                if columns is not None:
+                    return result_page(results.create(columns, [rows]))
+                statements.conn.commit()
+                return {"message": "Query executed successfully."}
+        except mysql.connector.Error as err:
+            logging.error(f"Prepared query execution failed: {err}")
+            return {"error": str(err)}
+
+    if router:
+        return run_routed_query(query)
+
+    connection, cursor = get_db_connection()
+    if not connection:
+        return {"error": "Database connection failed."}
+
+    try:
+        cursor.execute(query)
+        if cursor.with_rows:
+            return result_page(results.from_cursor(cursor))
+        else:
+            connection.commit()
+            return {"message": "Query executed successfully."}
+    except mysql.connector.Error as err:
+        logging.error(f"Query execution failed: {err}")
+        return {"error": str(err)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+            logging.info("Database connection closed.")
+
+def run_routed_query(query):
+    """Runs a query on the server picked by the replica router."""
+    def execute(connection, endpoint):
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query)
+            if cursor.with_rows:
+                payload = result_page(results.from_cursor(cursor))
+            else:
+                connection.commit()
+                payload = {"message": "Query executed successfully."}
+            payload["routed_to"] = endpoint.name
+            return payload
+        finally:
+            cursor.close()
+
+    try:
+        return router.run(query, execute)
+    except mysql.connector.Error as err:
+        logging.error(f"Query execution failed: {err}")
+        return {"error": str(err)}
+
+def show_db_structure():
+    """Introspects the database, saves the structure and returns the response payload."""
+    connection, cursor = get_db_connection()
+    if not connection:
+        return {"error": "Database connection failed."}
+
+    structure = get_db_structure(cursor)
+    if connection.is_connected():
+        cursor.close()
+        connection.close()
+        logging.info("Database connection closed.")
+
+    if structure:
+        profiler.refresh_in_background(structure)
+        return {"structure": structure}
+    else:
+        return {"error": "Failed to get database structure."}
+
+def get_schema_fingerprint():
+    """
+    Fingerprints the live schema with one information_schema query, the
+    same way schema_fingerprint hashes a saved structure. None on failure.
+    """
+    connection, cursor = get_db_connection()
+    if not connection:
+        return None
+    try:
+        cursor.execute(
+            "SELECT table_name, column_name, data_type FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() ORDER BY table_name, ordinal_position"
+        )
+        tables = {}
+        for table_name, column_name, data_type in cursor.fetchall():
+            tables.setdefault(table_name, []).append([column_name, data_type])
+        return schema_fingerprint([{"table_name": t, "columns": c} for t, c in tables.items()])
+    except mysql.connector.Error as err:
+        logging.error(f"Failed to fingerprint database structure: {err}")
+        return None
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def generate_query(question):
+    """Asks the LLM for a query answering `question` and returns the response payload."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return {"error": "OPENAI_API_KEY not found in .env file."}
+
+    structure_path = os.path.join(os.path.dirname(__file__), "..", "SavedData", "db_structure.json")
+    if not os.path.exists(structure_path):
+        return {"error": "Database structure not found. Please run 'Show DB Structure' first."}
+        
+    with open(structure_path, "r") as f:
+        db_structure = json.load(f)
+        
+    connection, cursor = get_db_connection()
+    if not connection:
+        return {"error": "Database connection failed."}
+    try:
+        cursor.execute("SELECT DATABASE()")
+        db_name = cursor.fetchone()[0]
+    except Exception as e:
+        return {"error": f"Could not read database name: {e}"}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+            logging.info("Database connection closed.")
+
+    prompt = f"""
+        DB: {db_name}
+        Schema: {db_structure}
+
+        Write an optimized SQL query to answer: "{question}"
+
+        Rules:
+        - Use valid SQL for this DB
+        - Include joins/subqueries if needed
+        - Output only the SQL query (no text/comments)
+        - End with a semicolon
+        """
+
+    snippets = profile_snippets(profiler.profiles, db_structure, question)
+    if snippets:
+        prompt += f"\nColumn statistics (sampled):\n{snippets}\n"
+
+    client = OpenAI(api_key=api_key)
+
+    def ask(messages):
+        response = client.chat.completions.create(
+            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+            messages=[
+                {"role": "system","content": "You are an advanced, expert-level SQL query generator. Your role is to understand the user's intent and produce only a valid and optimized SQL query as output — no explanations, no text, and no comments. Always return the query in proper SQL syntax using advanced techniques such as joins, subqueries, window functions, and aggregations when appropriate."},
+            ] + messages,
+            temperature=0.2,
+            max_tokens=300,
+        )
+        return response.choices[0].message.content
+
+    try:
+        # Generated SQL is checked locally against the saved schema; errors
+        # go back to the model instead of to MySQL.
+        result, stats = generate_with_repair(
+            ask, prompt, db_structure, max_attempts=int(os.getenv("SQL_REPAIR_ATTEMPTS", 3))
+        )
+        logging.info(f"Query generated in {stats['attempts']} LLM call(s); valid={stats['valid']}; totals={stats['totals']}")
+        return {"query": result, "repair": stats}
+    except Exception as e:
+        logging.error(f"OpenAI API call failed: {e}")
+        return {"error": str(e)}
+
+def structure_response(payload):
+    """
+    Builds the show_db_structure response. The ETag is the schema
+    fingerprint, so a client holding the same schema gets a bodiless 304.
+    """
+    response = jsonify(payload)
+    if "structure" in payload:
+        response.set_etag(schema_fingerprint(payload["structure"]), weak=True)
+        response.headers["Cache-Control"] = "no-cache"
+        response.make_conditional(request)
+    return response
+
 # ------------------ Routes ------------------
 @app.route('/')
 def index():
     """Renders the main page."""
     return render_template('index.html')
 
+@app.route('/api/structure', methods=['GET'])
+def api_structure():
+    """
+    Conditional-GET variant of the show_db_structure action. The schema is
+    fingerprinted with one cheap query first, so a client that already
+    holds it gets a 304 without the per-table introspection, the profiler
+    refresh or the rewrite of db_structure.json.
+    """
+    fingerprint, _ = inflight.do(("schema_fingerprint",), get_schema_fingerprint)
+    if fingerprint and request.if_none_match.contains_weak(fingerprint):
+        response = Response(status=304)
+        response.set_etag(fingerprint, weak=True)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    payload, shared = inflight.do(("show_db_structure",), show_db_structure)
+    if shared:
+        logging.info("Coalesced show_db_structure with an in-flight request.")
+    return structure_response(payload)
+
+@app.route('/api/replicas', methods=['GET'])
+def api_replicas():
+    """Reports the routing state of the primary and each replica."""
+    if not router:
+        return jsonify({"error": "No replicas configured (set DB_REPLICAS)."})
+    return jsonify({"endpoints": router.status()})
+
+@app.route('/api/statements', methods=['GET'])
+def api_statements():
+    """Reports the prepared statement pool: connections, cached statements, hits and misses."""
+    return jsonify(statement_pool.stats())
+
+@app.route('/api/complete', methods=['GET'])
+def api_complete():
+    """Schema-aware completions for the word at `cursor` in `text`."""
+    text = request.args.get('text', '')
+    try:
+        cursor = min(max(int(request.args.get('cursor', len(text))), 0), len(text))
+        limit = min(int(request.args.get('limit', 20)), 100)
+    except ValueError:
+        return jsonify({"error": "cursor and limit must be integers."})
+    completions.refresh()
+    return jsonify({"completions": completions.complete(text, cursor, limit)})
+
 @app.route('/api', methods=['POST'])
 def api():
     """Handles all API requests."""
@@ -73,107 +394,85 @@ def api():
         if not query:
             return jsonify({"error": "Query cannot be empty."})
 
-        connection, cursor = get_db_connection()
-        if not connection:
-            return jsonify({"error": "Database connection failed."})
+        try:
+            params = parse_params(request.form.get('params'))
+        except ValueError as e:
+            return jsonify({"error": f"Invalid params: {e}"})
+        auto = request.form.get('auto_parameterize') == '1'
+
+        # Identical read-only queries that arrive together share one execution.
+        if not is_read_only(query):
+            return jsonify(run_query(query, params, auto))
+        key = ("run_query", query.strip(), json.dumps(params), auto)
+        payload, shared = inflight.do(key, run_query, query, params, auto)
+        if shared:
+            logging.info("Coalesced run_query with an in-flight request.")
+        return jsonify(payload)
 
+    elif action == 'fetch_page':
         try:
-            cursor.execute(query)
-            if cursor.with_rows:
-                rows = cursor.fetchall()
-                columns = [i[0] for i in cursor.description]
-                return jsonify({"columns": columns, "rows": rows})
-            else:
-                connection.commit()
-                return jsonify({"message": "Query executed successfully."})
-        except mysql.connector.Error as err:
-            logging.error(f"Query execution failed: {err}")
-            return jsonify({"error": str(err)})
-        finally:
-            if connection.is_connected():
-                cursor.close()
-                connection.close()
-                logging.info("Database connection closed.")
+            handle = results.get(request.form.get('handle', ''))
+        except KeyError:
+            return jsonify({"error": "Result has expired. Please run the query again."})
+        try:
+            return jsonify(result_page(
+                handle,
+                offset=int(request.form.get('offset', 0)),
+                limit=int(request.form.get('limit', PAGE_SIZE)),
+                sort=request.form.get('sort') or None,
+                descending=request.form.get('descending') == '1',
+                filter_text=request.form.get('filter') or None,
+            ))
+        except ValueError as e:
+            return jsonify({"error": str(e)})
 
-    elif action == 'show_db_structure':
-        connection, cursor = get_db_connection()
-        if not connection:
-            return jsonify({"error": "Database connection failed."})
+    elif action == 'summarize':
+        try:
+            handle = results.get(request.form.get('handle', ''))
+        except KeyError:
+            return jsonify({"error": "Result has expired. Please run the query again."})
 
-        structure = get_db_structure(cursor)
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
-            logging.info("Database connection closed.")
-            
-        if structure:
-            return jsonify({"structure": structure})
-        else:
-            return jsonify({"error": "Failed to get database structure."})
+        def stream():
+            # One JSON summary per line, so the page can render each partial as it arrives.
+            try:
+                for summary in iter_summary(handle):
+                    yield json.dumps(summary) + "\n"
+            except Exception as e:
+                logging.error(f"Failed to summarize result {handle.id}: {e}")
+                yield json.dumps({"error": str(e)}) + "\n"
+
+        return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+    elif action == 'show_db_structure':
+        payload, shared = inflight.do(("show_db_structure",), show_db_structure)
+        if shared:
+            logging.info("Coalesced show_db_structure with an in-flight request.")
+        return structure_response(payload)
 
     elif action == 'generate_query':
         question = request.form.get('question')
         if not question:
             return jsonify({"error": "Please enter a prompt to generate a query."})
 
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            return jsonify({"error": "OPENAI_API_KEY not found in .env file."})
-
-        structure_path = os.path.join(os.path.dirname(__file__), "..", "SavedData", "db_structure.json")
-        if not os.path.exists(structure_path):
-            return jsonify({"error": "Database structure not found. Please run 'Show DB Structure' first."})
-            
-        with open(structure_path, "r") as f:
-            db_structure = json.load(f)
-            
-        connection, cursor = get_db_connection()
-        if not connection:
-            return jsonify({"error": "Database connection failed."})
-        try:
-            cursor.execute("SELECT DATABASE()")
-            db_name = cursor.fetchone()[0]
-        except Exception as e:
-            return jsonify({"error": f"Could not read database name: {e}"})
-        finally:
-            if connection.is_connected():
-                cursor.close()
-                connection.close()
-                logging.info("Database connection closed.")
-
-        prompt = f"""
-            DB: {db_name}
-            Schema: {db_structure}
-
-            Write an optimized SQL query to answer: "{question}"
+        key = ("generate_query", question.strip())
+        payload, shared = inflight.do(key, generate_query, question)
+        if shared:
+            logging.info("Coalesced generate_query with an in-flight request.")
+        return jsonify(payload)
 
-            Rules:
-            - Use valid SQL for this DB
-            - Include joins/subqueries if needed
-            - Output only the SQL query (no text/comments)
-            - End with a semicolon
-            """
-
-        try:
-            client = OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-                messages=[
-                    {"role": "system","content": "You are an advanced, expert-level SQL query generator. Your role is to understand the user's intent and produce only a valid and optimized SQL query as output — no explanations, no text, and no comments. Always return the query in proper SQL syntax using advanced techniques such as joins, subqueries, window functions, and aggregations when appropriate."},
-                    {"role": "user", "content": prompt.strip()},
-                ],
-                temperature=0.2,
-                max_tokens=300,
+    elif action == 'export_csv':
+        handle_id = request.form.get('handle')
+        if handle_id:
+            try:
+                handle = results.get(handle_id)
+            except KeyError:
+                return jsonify({"error": "Result has expired. Please run the query again."})
+            return Response(
+                stream_with_context(handle.iter_csv()),
+                mimetype='text/csv',
+                headers={"Content-Disposition": "attachment; filename=exported_data.csv"},
             )
-            result = response.choices[0].message.content.strip()
-            if result.startswith("```"):
-                result = result.strip("`").replace("sql", "").strip()
-            return jsonify({"query": result})
-        except Exception as e:
-            logging.error(f"OpenAI API call failed: {e}")
-            return jsonify({"error": str(e)})
 
-    elif action == 'export_csv':
         data = request.form.get('data')
         if not data:
             return jsonify({"error": "No data to export."})
@@ -0,0 +1,121 @@
+import zlib
+import logging
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+)
+
+
+def _accepted_encodings(header):
+    """Parses Accept-Encoding into {encoding: q}."""
+    accepted = {}
+    for part in (header or "").split(","):
+        fields = part.strip().split(";")
+        name = fields[0].strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def choose_encoding(header):
+    """Picks br or gzip from an Accept-Encoding header, or None."""
+    accepted = _accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Compressor:
+    """Incremental gzip/brotli compressor with a common interface."""
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=min(level, 11))
+        else:
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data):
+        """Compresses `data` and flushes so the client can decode it right away."""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+
+def _stream(iterable, compressor):
+    for data in iterable:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if data:
+            yield compressor.chunk(data)
+    yield compressor.finish()
+
+
+def init_compression(app, threshold=1024, level=6):
+    """
+    Compresses responses with brotli or gzip, negotiated per request from
+    Accept-Encoding. Buffered bodies smaller than `threshold` bytes are sent
+    as-is. Streamed bodies are compressed chunk by chunk, flushing after each
+    one, so they are never buffered in full.
+    """
+
+    @app.after_request
+    def compress_response(response):
+        response.vary.add("Accept-Encoding")
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or "no-transform" in response.headers.get("Cache-Control", "")
+            or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+
+        compressor = _Compressor(encoding, level)
+        if response.is_streamed:
+            response.direct_passthrough = False
+            response.response = _stream(response.response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < threshold:
+                return response
+            response.set_data(compressor.finish(data))
+            logging.debug(f"Compressed response {len(data)} -> {response.content_length} bytes ({encoding}).")
+
+        response.headers["Content-Encoding"] = encoding
+        return response